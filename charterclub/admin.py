@@ -1,5 +1,7 @@
+import csv
+
 from django.contrib import admin
-from django.http import  HttpResponseRedirect
+from django.http import  HttpResponse, HttpResponseRedirect
 from django.conf.urls import patterns, include, url
 
 import forms
@@ -39,6 +41,7 @@ class MemberAdmin(admin.ModelAdmin):
     search_fields = ['first_name', 'last_name', 'netid', 'year']
     list_filter = (CurrentMembershipListFilter, 'year')
     show_full_result_count = True
+    actions = ['export_events']
     
     def get_readonly_fields(self, request, obj=None):
         if obj:
@@ -46,6 +49,25 @@ class MemberAdmin(admin.ModelAdmin):
         else:
             return []
 
+    def export_events(self, request, queryset):
+        '''
+            Download the events the selected members signed up for as CSV.
+        '''
+        members = list(queryset)
+        events = Member.get_events_for(members)
+
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="member-events.csv"'
+
+        writer = csv.writer(response)
+        writer.writerow(['Member', 'Netid', 'Year', 'Event', 'Date', 'Room', 'Guests'])
+        for member in members:
+            for event, room, guests in events[member.pk]:
+                row = [member, member.netid, member.year, event.title, event.date, room.name, ', '.join(guests)]
+                writer.writerow([unicode(cell).encode('utf-8') for cell in row])
+        return response
+    export_events.short_description = "Export the selected members' events as CSV"
+
     # Adds the "add_members" to the url
     def get_urls(self):
         urls = super(MemberAdmin, self).get_urls()
@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from charterclub import permissions
+
+
+class IdentityMiddleware(object):
+    '''
+        Resolves the CAS logged-in user to their most derived role once per
+        request and attaches it as request.identity.
+
+        The lookup is lazy, so requests that never ask who the user is never
+        touch the database. Must come after the authentication and CAS
+        middleware, since it reads request.user.
+    '''
+    def process_request(self, request):
+        request.identity = SimpleLazyObject(lambda: permissions.resolve_identity(request))
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from charterclub.models import normalize_name
+
+
+def fill_name_keys(apps, schema_editor):
+    Person = apps.get_model('charterclub', 'Person')
+
+    for person in Person.objects.all():
+        Person.objects.filter(pk=person.pk).update(name_key=normalize_name(person.first_name, person.last_name))
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charterclub', '0010_staff_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='name_key',
+            field=models.CharField(db_index=True, max_length=200, editable=False, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(fill_name_keys, noop),
+    ]
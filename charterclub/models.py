@@ -6,7 +6,7 @@ from django import forms
 from django.core.validators import RegexValidator
 from django.contrib.contenttypes.models import ContentType
 
-import pdb
+import pdb, re
 from collections import Counter
 
 # from events.models import Event
@@ -15,7 +15,7 @@ from django.core.exceptions import ValidationError
 
 # For analyzing Models
 from django.db.models import Min, Max
-from kitchen.models import Meal
+from kitchen.models import Meal, InheritanceCastQuerySet
 
 from settings_charter.settings_service import DynamicSettingsServices
 
@@ -30,6 +30,8 @@ class InheritanceCastModel(models.Model):
     """
     real_type = models.ForeignKey(ContentType, editable=False)
 
+    objects = InheritanceCastQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if not self.id:
             self.real_type = self._get_real_type()
@@ -38,8 +40,18 @@ class InheritanceCastModel(models.Model):
     def _get_real_type(self):
         return ContentType.objects.get_for_model(type(self))
 
+    def cast_class(self):
+        '''
+            The most derived model class of this instance. ContentTypes are
+            cached by their manager, so this does not hit the database.
+        '''
+        return ContentType.objects.get_for_id(self.real_type_id).model_class()
+
     def cast(self):
-        return self.real_type.get_object_for_this_type(pk=self.pk)
+        model = self.cast_class()
+        if type(self) is model:
+            return self
+        return model._base_manager.using(self._state.db).get(pk=self.pk)
 
     class Meta:
         abstract = True
@@ -60,13 +72,26 @@ def validate_image(fieldfile_obj):
         raise ValidationError("Max file size is %sKB. Sorry! This is to ensure that\
          the site doesn't freeze when faceboard photos are loaded." % str(kilobyte_limit))
 
+# Reduce a name to a key for matching people by name: casefolded, with all
+# whitespace and punctuation removed, so "Mary-Ann  O'Neil" == "maryann oneil"
+def normalize_name(*names):
+    name = u''.join(names).lower()
+    return re.sub(r'[\W_]+', u'', name, flags=re.UNICODE)
+
 class Person(InheritanceCastModel):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
 
+    # normalize_name(first_name, last_name), kept up to date by save()
+    name_key = models.CharField(max_length=200, db_index=True, editable=False, blank=True)
+
     class meta:
         ordering = ('last_name', 'first_name')
 
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_name(self.first_name, self.last_name)
+        super(Person, self).save(*args, **kwargs)
+
     def __unicode__(self):
         return "%s %s" % (self.first_name, self.last_name)
 #     picture_path = models.CharField(
@@ -105,6 +130,25 @@ class Student(Person):
     def get_senior_year():
         return (timezone.now() - timedelta(days=153)).year + 1
 
+    @staticmethod
+    def get_most_derived(netid):
+        '''
+            Looks up a netid as its most derived class (Officer, Member,
+            Prospective or Student). The Student row and its real_type come
+            back in one query on the unique netid index; the concrete
+            subclass row is only fetched when it is not a plain Student.
+        '''
+        student = Student.objects.filter(netid=netid).first()
+        if not student:
+            return None
+        return student.cast()
+
+    def is_prospective(self):
+        return issubclass(self.cast_class(), Prospective)
+
+    def is_member(self):
+        return issubclass(self.cast_class(), Member)
+
 
     # def __init__(self, member):
     #     self.pk = member.pk
@@ -215,18 +259,32 @@ class Member(Student):
     allow_rsvp = models.BooleanField(
         'Whether or not this member may attend events', default=True)
 
-    # Get the events associated with the member
+    # Get the events associated with the member, as (event, room, guests)
     def get_events(self):
-        ans = []
+        return Member.get_events_for([self])[self.pk]
+
+    @staticmethod
+    def get_events_for(members):
+        '''
+            get_events() for many members from one query over Entry. Returns
+            {member id: [(event, room, [guest names])]}, newest event first.
+        '''
+        from events.models import Entry
+
+        events = dict((member.pk, []) for member in members)
+        if not events:
+            return events
 
-        # Do a brute force search through all of the events, the rooms, and the seatings
-        for e in events.models.Event.objects.all():
-            for r in e.rooms.all():
-                for member, guest_s in r.get_people_as_objects():
+        entry_q = Entry.objects.filter(student__in=events.keys()).select_related('event', 'room')\
+                               .order_by('-event__date', 'event__id', 'room__id')
 
-                    if member == self:
-                        ans.append((e, r, guest_s))
-        return ans
+        for entry in entry_q:
+            member_events = events[entry.student_id]
+            if not member_events or member_events[-1][:2] != (entry.event, entry.room):
+                member_events.append((entry.event, entry.room, []))
+            if entry.guest:
+                member_events[-1][2].append(entry.guest)
+        return events
 
     # Creates a member, if possible
     def create_new_member(self, param):
@@ -1,7 +1,9 @@
-import urllib2, json
+import urllib2, json, copy, threading, time
+from collections import OrderedDict
 
 import django.shortcuts
 from django.conf import settings
+from django.db.models.signals import post_save, post_delete
 from django.utils import timezone
 
 from django.contrib.auth.models import User
@@ -12,6 +14,7 @@ from models import Member
 from models import Student
 
 from charterclub.models import Prospective, Member, Officer
+from kitchen.models import connect_model_signals
 
 #TODO do we use most of this right no? or only a piece?
 
@@ -33,12 +36,12 @@ from charterclub.models import Prospective, Member, Officer
 #
 #######################################################
 def privileged(func):
-	def check_p(request, *args, **kwargs):
-		if not check_staff(request):
-			return render(request, "permission_denied.html",
-						  {"required_permission": "privileged"})
-		return func(request, *args, **kwargs)
-	return check_p
+    def check_p(request, *args, **kwargs):
+        if not check_your_privilege(request):
+            return render(request, "permission_denied.html",
+                          {"required_permission": "privileged"})
+        return func(request, *args, **kwargs)
+    return check_p
 
 def officer(func):
     def check_o(request, *args, **kwargs):
@@ -74,38 +77,178 @@ def prospective(func):
     return check_s
 
 
-def additional_context(request):
+#######################################################
+# Identity of the logged-in user
+#
+#######################################################
+class Identity(object):
     '''
-        Does a search of the database and returns the results
+        The CAS logged-in user, resolved to their most derived role
+        (Officer > Member > Prospective > Student).
+
+        IdentityMiddleware attaches one of these to every request as
+        request.identity, so the role lookup happens once per request no
+        matter how many decorators, check_* helpers and renders ask for it.
     '''
-    def dereference(query_a):
-        "Unwraps a query set"
-        if len(query_a):
-          return query_a[0]
-        else:
-          return None 
+    def __init__(self, netid, person=None, privileged=False):
+        self.netid = netid
+        self.person = person
+        self.privileged = privileged
+
+    @property
+    def student(self):
+        return self.person
+
+    @property
+    def prospective(self):
+        if isinstance(self.person, Prospective):
+            return self.person
+        return None
+
+    @property
+    def member(self):
+        if isinstance(self.person, Member):
+            return self.person
+        return None
+
+    @property
+    def officer(self):
+        if isinstance(self.person, Officer):
+            return self.person
+        return None
+
+
+class IdentityCache(object):
+    '''
+        Process-local LRU cache of resolved identities, keyed by netid.
 
+        Entries expire after `ttl` seconds and the least recently used ones
+        are dropped past `max_size`. Saving or deleting a Student (or any
+        subclass) or a User evicts that netid through the signals below.
+        Signals only reach the process that did the save, so other workers
+        can serve a stale role for at most `ttl` seconds.
+    '''
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, netid):
+        '''
+            Returns the cached (person, privileged) pair, or None on a miss.
+        '''
+        with self._lock:
+            entry = self._entries.pop(netid, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+
+            # Re-insert to mark it as most recently used
+            self._entries[netid] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, netid, value):
+        with self._lock:
+            self._entries.pop(netid, None)
+            self._entries[netid] = (time.time() + self.ttl, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, netid):
+        with self._lock:
+            self._entries.pop(netid, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                    'size': len(self._entries),
+                    'max_size': self.max_size,
+                    'ttl': self.ttl}
+
+identity_cache = IdentityCache(getattr(settings, 'IDENTITY_CACHE_SIZE', 2048),
+                               getattr(settings, 'IDENTITY_CACHE_TTL', 120))
+
+def evict_student_identity(sender, instance, **kwargs):
+    identity_cache.evict(instance.netid)
+
+def evict_user_identity(sender, instance, **kwargs):
+    identity_cache.evict(instance.username)
+
+connect_model_signals(evict_student_identity, Student)
+post_save.connect(evict_user_identity, sender=User)
+post_delete.connect(evict_user_identity, sender=User)
+
+
+def resolve_identity(request):
+    '''
+        Returns the Identity of the logged-in user, from identity_cache when
+        possible and from the database otherwise.
+    '''
     netid = get_username(request)
-    
-    # Lookup people
-    priv = None
-    if (check_your_privilege(request)):
-        priv = netid
-    o = dereference(Officer.objects.filter(netid=netid))
-    m = dereference(Member.objects.filter(netid=netid))
-    p = dereference(Prospective.objects.filter(netid=netid))
-    now = timezone.now()
+    if netid == "":
+        return Identity(netid)
+
+    cached = identity_cache.get(netid)
+    if cached is not None:
+        person, privileged = cached
+        # Hand every request its own instance so nothing leaks between them
+        return Identity(netid, copy.copy(person), privileged)
+
+    # CAS already loaded request.user for this netid, so reuse it
+    user = getattr(request, 'user', None)
+    if user is not None and user.username == netid:
+        privileged = user.is_staff
+    else:
+        privileged = User.objects.filter(username=netid, is_staff=True).exists()
+
+    person = Student.get_most_derived(netid)
+    identity_cache.set(netid, (person, privileged))
 
-    # Then return the results with the proper object pointers
-	# TODO see if we can merge down these cases (eg do we need the o case or do we get member already?)
-    if o:
-        return { "netid": netid, "privileged": priv, "officer" : o, "member" : o.member, "student" : o.member.student, "prospective" : p, 'now': now}
-    if m:  
-        return { "netid": netid, "privileged": priv, "officer" : o, "member" : m, "student" : m.student, "prospective" : p, 'now': now}
-    if p:
-        return { "netid" : netid, "privileged": priv, "officer" : o, "member" : m, "student" : p.student, "prospective" : p, 'now': now}
+    return Identity(netid, copy.copy(person), privileged)
 
-    return  { "netid": netid, "privileged": priv, "officer" : None, "member" : None, "student" : None, "prospective" : None}
+
+def get_identity(request):
+    '''
+        Returns the Identity attached by IdentityMiddleware, resolving it
+        here if the middleware did not run.
+    '''
+    identity = getattr(request, 'identity', None)
+    if identity is None:
+        identity = resolve_identity(request)
+        request.identity = identity
+    return identity
+
+
+def additional_context(request):
+    '''
+        Returns the user information that every template gets
+    '''
+    identity = get_identity(request)
+
+    priv = None
+    if identity.privileged:
+        priv = identity.netid
+
+    return { "netid": identity.netid,
+             "privileged": priv,
+             "officer" : identity.officer,
+             "member" : identity.member,
+             "student" : identity.student,
+             "prospective" : identity.prospective,
+             'now': timezone.now()}
 
 
 # a replacement render function which passes some additional
@@ -141,19 +284,7 @@ def get_student(request):
     '''
         Checks the login and takes the highest priority one.
     '''
-
-    query = additional_context(request)
-	
-    if query['officer']:
-        return query['officer']
-    if query['member']:
-        return query['member']
-    if query['prospective']:
-        return query['prospective']
-    if query['student']:
-        return query['student']
-
-    return None
+    return get_identity(request).person
 
 def tigerbooks_lookup(netid):
     '''
@@ -173,75 +304,27 @@ def tigerbooks_lookup(netid):
 # check if the currently CAS logged-in user is staff, returning
 # true if so and false otherwise.
 def check_your_privilege(request):
-    usr = get_username(request)
-    if usr == "":
-        return False
-
-    user = User.objects.filter(username=usr)
-
-    if len(user) == 0:
-        return False
-    elif (user[0].is_staff):
-        return True
-	return False
- 
-
+    return get_identity(request).privileged
 
 # check if the currently CAS logged-in user is an officer, returning
 # true if so and false otherwise.
 def check_officer(request):
-    netid = get_username(request)
-    if netid == "":
-        return False
-
-    user = Officer.objects.filter(netid=netid)
+    return get_identity(request).officer is not None
 
-    if len(user) == 0:
-        return False
-    else:
-        return True
-    
 # check if the currently CAS logged-in user is a member, returning
 # true if so and false otherwise.
 def check_member(request):
-    netid = get_username(request)
-    if netid == "":
-        return False
-
-    user = Member.objects.filter(netid=netid)
-
-    if len(user) == 0:
-        return False
-    else:
-        return True
+    return get_identity(request).member is not None
 
 # check if the currently CAS logged-in user is a prospective, returning
 # true if so and false otherwise.
 def check_prospective(request):
-    netid = get_username(request)
-    if netid == "":
-        return False
+    return get_identity(request).prospective is not None
 
-    user = Prospective.objects.filter(netid=netid)
-
-    if len(user) == 0:
-		return False
-    else:
-        return True
-
-# check if the currently CAS logged-in user is a member, returning
+# check if the currently CAS logged-in user is a student, returning
 # true if so and false otherwise.
 def check_student(request):
-    netid = get_username(request)
-    if netid == "":
-        return False
-
-    user = Student.objects.filter(netid=netid)
-
-    if len(user) == 0:
-        return False
-    else:
-        return True
+    return get_identity(request).student is not None
 
 # import datetime
 # import ldap_student_lookup
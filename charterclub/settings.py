@@ -54,6 +54,50 @@ ALLOWED_HOSTS = [
 	'.herokuapp.com'
 ]
 
+# charterclub.permissions keeps resolved identities in a per-process cache.
+# Saves evict immediately in the saving process; other gunicorn workers
+# may see a stale role for up to IDENTITY_CACHE_TTL seconds.
+IDENTITY_CACHE_SIZE = 2048
+IDENTITY_CACHE_TTL = 120
+
+# Admission queue for events_signup (see events/admission.py). For the
+# first SIGNUP_QUEUE_RUSH_WINDOW seconds after a class's signup opens, only
+# SIGNUP_QUEUE_CONCURRENCY students of that class get the form at once. Set
+# it to 0 to turn the queue off. The line moves along at most every
+# SIGNUP_QUEUE_SWEEP seconds. All times are in seconds.
+SIGNUP_QUEUE_CONCURRENCY = 25
+SIGNUP_QUEUE_MAX_WAITING = 1000
+SIGNUP_QUEUE_RUSH_WINDOW = 30 * 60
+SIGNUP_QUEUE_POLL = 5
+SIGNUP_QUEUE_POLL_TIMEOUT = 30
+SIGNUP_QUEUE_LEASE = 10 * 60
+SIGNUP_QUEUE_SWEEP = 5
+
+# The signup page asks for its room counts every ROOM_OCCUPANCY_POLL
+# seconds. Each poll is one query and answers at once (304 if nothing
+# changed), so it never holds a server worker.
+ROOM_OCCUPANCY_POLL = 5
+
+# manage.py archive_events keeps the current academic year plus this many
+# previous ones in the live event tables, and moves
+# EVENT_ARCHIVE_BATCH_SIZE events per transaction.
+EVENT_ARCHIVE_KEEP_YEARS = 1
+EVENT_ARCHIVE_BATCH_SIZE = 20
+
+# Assembled weeks of the menu are kept in the cache for up to this many
+# seconds, and dropped as soon as a meal (or a sophomore signup) in the
+# week changes. There is no CACHES setting, so each server process has its
+# own in-memory cache and only sees its own changes: the menu and its
+# sophomore counts can be this many seconds stale in the other processes.
+# Only raise it once a shared cache such as memcached is configured.
+WEEKLY_MENU_CACHE_TIMEOUT = 60
+
+# The meal check-in kiosk (see kitchen/checkin.py) marks check-ins completed
+# once CHECKIN_BATCH_SIZE are waiting or the oldest has waited
+# CHECKIN_FLUSH_SECONDS seconds.
+CHECKIN_BATCH_SIZE = 10
+CHECKIN_FLUSH_SECONDS = 30
+
 CRISPY_TEMPLATE_PACK = 'bootstrap3'
 
 CART_PRODUCT_MODEL = 'gear.models.GearItem'
@@ -101,6 +145,8 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.flatpages.middleware.FlatpageFallbackMiddleware',
     # required for CAS
     'django_cas.middleware.CASMiddleware',
+    # resolves request.identity, must come after the auth/CAS middleware
+    'charterclub.middleware.IdentityMiddleware',
     'django.middleware.doc.XViewMiddleware'
 )
 
@@ -0,0 +1,54 @@
+'''
+    Helpers for the apps' test suites.
+'''
+import re
+
+from django.db import connection
+from django.test import TestCase
+
+
+class QueryPlanTestCase(TestCase):
+    '''
+        A TestCase that can check a queryset's plan with EXPLAIN, so that a
+        hot query which stops using its index fails a test rather than
+        quietly turning into a full table scan in production.
+
+        Runs EXPLAIN QUERY PLAN on SQLite, and EXPLAIN with sequential scans
+        discouraged on PostgreSQL; other databases skip the check.
+    '''
+
+    def query_plan(self, queryset):
+        '''
+            The lines of the database's plan for the queryset.
+        '''
+        sql, params = queryset.query.sql_with_params()
+        cursor = connection.cursor()
+
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+        if connection.vendor == 'postgresql':
+            # The test tables are nearly empty, so without this the planner
+            # would rightly prefer a sequential scan everywhere.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+        self.skipTest('No query plan check for %s' % connection.vendor)
+
+    def assertUsesIndex(self, queryset, table=None):
+        '''
+            Fails if the plan reads the whole of table (the queryset's own
+            table by default) instead of going through an index.
+        '''
+        table = table or queryset.model._meta.db_table
+        plan = self.query_plan(queryset)
+
+        if connection.vendor == 'sqlite':
+            full_scan = re.compile(r'^SCAN (TABLE )?%s\b' % re.escape(table))
+        else:
+            full_scan = re.compile(r'Seq Scan on %s\b' % re.escape(table))
+
+        scans = [line for line in plan if full_scan.search(line.strip())]
+        self.assertFalse(scans, 'Full scan of %s in plan:\n%s' % (table, '\n'.join(plan)))
@@ -98,6 +98,10 @@ urlpatterns = patterns('',
         r'^contactus$',
         'charterclub.views.contactus',
         name='contactus'),
+    url(
+        r'^identity_cache_stats$',
+        'charterclub.views.identity_cache_stats',
+        name='identity_cache_stats'),
     url(
         r'^underconstruction$',
         'charterclub.views.underconstruction',
@@ -5,7 +5,7 @@ from django.template import RequestContext
 from django.template.loader import get_template
 from django.conf import settings
 
-import datetime
+import datetime, json
 from datetime import date, timedelta
 
 from forms import *
@@ -186,7 +186,7 @@ def profile(request):
     past_entries = Entry.get_past_related_entries_for_student(student)
 
     # Show prospective page
-    if student.__class__.__name__== 'Prospective':
+    if student.is_prospective():
         pmv = ProspectiveModelViewer(student.cast())
 
         # If there is a login, setup the proper page for them
@@ -197,25 +197,16 @@ def profile(request):
         year = Student.get_senior_year()
         begin_date = now - timedelta(weeks=52)
 
-        future_events = Event.objects.filter(date__gte=now).order_by("date")
-        past_events = Event.objects.filter(date__gte=begin_date, date__lte=now).order_by("-date")
-        if student:
-            future_events_q = [e.has_student(student) for e in future_events]
-            future_rsvp_guests = [e.get_guests(student) for e in future_events]
-            past_events_q     = [e.has_student(student) for e in past_events]
-            past_rsvp_guests = [e.get_guests(student) for e in past_events]
-        else:
-            future_events_q = [False for e in future_events]
-            future_rsvp_guests = [[] for e in future_events]
-            past_events_q = [False for e in past_events]
-            past_rsvp_guests = [[] for e in past_events]
+        # Only the upcoming events are shown on the profile
+        future_events = list(Event.objects.filter(date__gte=now).order_by("date"))
+        rsvp_map = Event.rsvp_map_for(student, future_events)
 
         return render(request, "charterclub/prospective_profile.html", {
               'prospective': student,
               'future_entries': future_entries,
               'prospective_model_viewer' : pmv,
               # 'events': e,
-              'future_events': zip(future_events, future_events_q, future_rsvp_guests),
+              'future_events': [(e,) + rsvp_map[e.id] for e in future_events],
               'netid': permissions.get_username(request)
         })
 
@@ -229,6 +220,12 @@ def profile(request):
 
 
 
+# Lets staff confirm the identity cache is earning its keep in production
+@permissions.privileged
+def identity_cache_stats(request):
+    return HttpResponse(json.dumps(permissions.identity_cache.stats()),
+                        content_type="application/json")
+
 def permission_denied(request):
     return render(request, "permission_denied.html")
 
@@ -1,5 +1,11 @@
-from django.contrib import admin
-from events.models import Event, Room, Entry, Question
+from django.contrib import admin, messages
+from django.conf.urls import patterns, url
+from django.http import HttpResponseRedirect
+from django.shortcuts import get_object_or_404, render
+from charterclub.models import Student
+from events.models import Event, Room, Entry, Question, RoomFullError
+from events.forms import MoveEntriesForm
+from events.assignment import plan_assignment, apply_assignment, AssignmentChanged
 
 # class RoomAdmin(admin.ModelAdmin):
 #     pass
@@ -30,7 +36,13 @@ class EntryInline(admin.TabularInline):
         return field
 
     def Form_Answers(self, obj):
-        return "\n".join([ans.__unicode__() for ans in obj.answers.all()])
+        # Every row belongs to the same event, so look its questions up once
+        if not hasattr(self, '_question_text'):
+            self._question_text = dict(Question.objects.filter(event=obj.event_id).values_list('id', 'question_text'))
+
+        answers = sorted(obj.get_answers().items())
+        return "\n".join(["%s:%s" % (self._question_text[question_id], text) 
+                          for question_id, text in answers if question_id in self._question_text])
 
 class QuestionInline(admin.TabularInline):
     model = Question
@@ -74,6 +86,70 @@ class EventAdmin(admin.ModelAdmin):
     def requires_rsvp(self, obj):
         return obj.require_rsvp
 
+    # Adds the "move entries" page to the url
+    def get_urls(self):
+        urls = super(EventAdmin, self).get_urls()
+        my_urls = patterns("",
+            url(r'^(\d+)/move-entries/$', self.admin_site.admin_view(self.move_entries)),
+            url(r'^(\d+)/balance-rooms/$', self.admin_site.admin_view(self.balance_rooms)),
+        )
+
+        return my_urls + urls
+
+    def move_entries(self, request, event_id):
+        '''
+            Moves a batch of entries, or a whole room, into another room with
+            one UPDATE through Room.move_entries().
+        '''
+        event = get_object_or_404(Event, pk=event_id)
+
+        if request.method == 'POST':
+            form = MoveEntriesForm(request.POST, event=event)
+            if form.is_valid():
+                num_moved = form.move_entries()
+                if num_moved is not None:
+                    self.message_user(request, "Moved %s entries to %s." % (num_moved, form.cleaned_data['to_room'].name))
+                    return HttpResponseRedirect('../')
+        else:
+            form = MoveEntriesForm(event=event)
+
+        return render(request, 'admin/events/event/move_entries.html', {
+            'form': form,
+            'event': event,
+            'opts': self.model._meta,
+        })
+
+    def balance_rooms(self, request, event_id):
+        '''
+            Previews a balanced assignment of the event's entries to its
+            rooms (see events/assignment.py), and applies it on POST if it is
+            still the plan that was previewed.
+        '''
+        event = get_object_or_404(Event, pk=event_id)
+
+        if request.method == 'POST':
+            try:
+                assignment = apply_assignment(event, request.POST.get('plan', ''))
+            except (AssignmentChanged, RoomFullError) as e:
+                self.message_user(request, "%s Nothing was moved; check the new plan below." % e, level=messages.ERROR)
+            else:
+                self.message_user(request, "Moved %s entries to balance the rooms." % len(assignment.moves))
+                return HttpResponseRedirect('../')
+
+        assignment = plan_assignment(event)
+        moving_in = dict((room.id, 0) for room in assignment.rooms)
+        for room_id in assignment.moves.values():
+            moving_in[room_id] += 1
+
+        return render(request, 'admin/events/event/balance_rooms.html', {
+            'event': event,
+            'rooms': [(room, assignment.loads[room.id], moving_in[room.id]) for room in assignment.rooms],
+            'num_moves': len(assignment.moves),
+            'plan': assignment.digest(),
+            'unplaced': Student.objects.filter(pk__in=assignment.unplaced),
+            'opts': self.model._meta,
+        })
+
     # def total(self, obj):
     #     return "%s/%s" % (obj.current_num_participants(), obj.max_num_participants())
 
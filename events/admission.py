@@ -0,0 +1,158 @@
+'''
+    Admission control for the signup page during a signup rush.
+
+    When signups open for a big event everyone loads events_signup at the
+    same moment. For the first SIGNUP_QUEUE_RUSH_WINDOW seconds after a
+    class's signup start, at most SIGNUP_QUEUE_CONCURRENCY students of that
+    class who have not signed up yet are let through to the form at a time;
+    everyone else gets a SignupTicket and a small "you are #N in line" page
+    that polls until it is their turn. Tickets are served in arrival order
+    (by id).
+
+    A poll is one indexed read of the student's ticket and their place in
+    line. The queue itself is moved along by sweep(), under the event's row
+    lock: it drops tickets whose students went away and admits the next
+    ones into the free slots. It runs when a student joins or finishes, and
+    otherwise at most once every SIGNUP_QUEUE_SWEEP seconds per process.
+
+    A ticket that stops polling for SIGNUP_QUEUE_POLL_TIMEOUT seconds gives
+    up its place, and an admitted ticket is released after the signup goes
+    through or after SIGNUP_QUEUE_LEASE seconds without a request.
+'''
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from charterclub.models import Student
+from events.models import Event, SignupTicket
+
+CONCURRENCY  = getattr(settings, 'SIGNUP_QUEUE_CONCURRENCY', 25)
+MAX_WAITING  = getattr(settings, 'SIGNUP_QUEUE_MAX_WAITING', 1000)
+RUSH_WINDOW  = getattr(settings, 'SIGNUP_QUEUE_RUSH_WINDOW', 30 * 60)
+POLL         = getattr(settings, 'SIGNUP_QUEUE_POLL', 5)
+POLL_TIMEOUT = getattr(settings, 'SIGNUP_QUEUE_POLL_TIMEOUT', 30)
+LEASE        = getattr(settings, 'SIGNUP_QUEUE_LEASE', 10 * 60)
+SWEEP        = getattr(settings, 'SIGNUP_QUEUE_SWEEP', 5)
+
+# A ticket's last_seen is only written again once it is this old, so most
+# polls do not write at all
+TOUCH = min(POLL_TIMEOUT, LEASE) / 3.0
+
+
+class QueueFull(Exception):
+    '''
+        Raised when SIGNUP_QUEUE_MAX_WAITING students are already in line.
+    '''
+    pass
+
+def signup_start(event, student):
+    '''
+        The aware datetime at which the student's class can sign up: the
+        same start EventEntryForm.clean() checks.
+    '''
+    if student.is_prospective():
+        day = event.prospective_signup_start
+    elif student.year <= Student.get_senior_year():
+        day = event.senior_signup_start
+    else:
+        day = event.junior_signup_start
+    if not day:
+        return None
+    return timezone.make_aware(datetime.combine(day, event.signup_time), timezone.get_default_timezone())
+
+def in_rush(event, student, now=None):
+    '''
+        Should the student wait in line for the event's signup page? Only
+        within RUSH_WINDOW of their own class's signup start, and only if
+        they have not signed up already.
+    '''
+    if not CONCURRENCY:
+        return False
+
+    now = now or timezone.now()
+    start = signup_start(event, student)
+    if start is None or not start <= now < start + timedelta(seconds=RUSH_WINDOW):
+        return False
+    return not event.entry_event_association.filter(student=student).exists()
+
+def sweep(event, now=None):
+    '''
+        Drops the tickets of students who went away and admits the next
+        students in line into the free slots. All sweeps for one event go
+        through its row lock, so the concurrency limit holds across server
+        processes.
+    '''
+    now = now or timezone.now()
+    cache.set('events.admission.sweep.%s' % event.pk, now, SWEEP * 2)
+
+    with transaction.atomic():
+        list(Event.objects.select_for_update().filter(pk=event.pk).values_list('pk', flat=True))
+
+        tickets = SignupTicket.objects.filter(event=event)
+        tickets.filter(admitted__isnull=False, last_seen__lt=now - timedelta(seconds=LEASE)).delete()
+        tickets.filter(admitted__isnull=True, last_seen__lt=now - timedelta(seconds=POLL_TIMEOUT)).delete()
+
+        free = CONCURRENCY - tickets.filter(admitted__isnull=False).count()
+        if free > 0:
+            next_ids = list(tickets.filter(admitted__isnull=True).order_by('pk').values_list('pk', flat=True)[:free])
+            if next_ids:
+                tickets.filter(pk__in=next_ids).update(admitted=now)
+
+def sweep_due(event, now):
+    last = cache.get('events.admission.sweep.%s' % event.pk)
+    return last is None or not (now - timedelta(seconds=SWEEP) < last <= now)
+
+def find_ticket(event, netid):
+    '''
+        (ticket id, admitted, last_seen, number waiting ahead) for netid's
+        ticket, or None, from one indexed query.
+    '''
+    table = SignupTicket._meta.db_table
+    ahead = ('SELECT COUNT(*) FROM %(table)s ahead WHERE ahead.event_id = %(table)s.event_id '
+             'AND ahead.admitted IS NULL AND ahead.id < %(table)s.id' % {'table': table})
+    return SignupTicket.objects.filter(event=event, netid=netid).extra(select={'ahead': ahead})\
+                               .values_list('id', 'admitted', 'last_seen', 'ahead').first()
+
+def admit(event, netid, now=None):
+    '''
+        Takes or refreshes netid's place in line for the event. Returns 0 if
+        the student may use the signup form now, otherwise their position
+        in line (1 is next). Raises QueueFull if a new student cannot join.
+    '''
+    now = now or timezone.now()
+    if sweep_due(event, now):
+        sweep(event, now)
+
+    ticket = find_ticket(event, netid)
+    if ticket is None:
+        if SignupTicket.objects.filter(event=event, admitted__isnull=True).count() >= MAX_WAITING:
+            raise QueueFull()
+        try:
+            with transaction.atomic():
+                SignupTicket.objects.create(event=event, netid=netid, last_seen=now)
+        except IntegrityError:
+            # Joined from another request at the same moment
+            pass
+
+        # Let the newcomer straight in if there is room
+        sweep(event, now)
+        ticket = find_ticket(event, netid)
+
+    ticket_id, admitted, last_seen, ahead = ticket
+    if last_seen < now - timedelta(seconds=TOUCH):
+        SignupTicket.objects.filter(pk=ticket_id).update(last_seen=now)
+
+    if admitted:
+        return 0
+    return ahead + 1
+
+def release(event, netid):
+    '''
+        Gives netid's admission slot to the next student in line. Only
+        needed while the student's class is in its rush.
+    '''
+    SignupTicket.objects.filter(event=event, netid=netid).delete()
+    sweep(event)
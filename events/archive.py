@@ -0,0 +1,97 @@
+'''
+    Moves past seasons out of the live event tables.
+
+    Events dated before the horizon are copied, with their questions, rooms
+    and entries, into the Archived* tables and then deleted, which also
+    deletes their Answer rows. By default the horizon is the start of the
+    previous academic year, so the pages that query Event and Entry only
+    see the current and the previous year. Events are moved in batches, one
+    transaction per batch, so an interrupted run leaves every event either
+    fully live or fully archived.
+
+    Run it with manage.py archive_events.
+'''
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import Event, Entry, ArchivedEvent, ArchivedQuestion, ArchivedRoom, ArchivedEntry
+
+# Academic years previous to the current one that stay in the live tables
+KEEP_YEARS = getattr(settings, 'EVENT_ARCHIVE_KEEP_YEARS', 1)
+BATCH_SIZE = getattr(settings, 'EVENT_ARCHIVE_BATCH_SIZE', 20)
+
+
+def academic_year_start(day):
+    '''
+        The first day of the academic year that day falls in. The year turns
+        over at the same point as Student.get_senior_year(), in early June.
+    '''
+    year = (day - timedelta(days=153)).year
+    return date(year, 1, 1) + timedelta(days=153)
+
+def default_horizon(today=None):
+    '''
+        Events before this date get archived.
+    '''
+    start = academic_year_start(today or timezone.now().date())
+    return academic_year_start(date(start.year - KEEP_YEARS, start.month, start.day))
+
+def archive_event(event):
+    '''
+        Copies one event into the archive and deletes it from the live
+        tables. Must be called inside transaction.atomic().
+    '''
+    archived = ArchivedEvent.objects.create(title=event.title,
+                                            snippet=event.snippet,
+                                            date=event.date,
+                                            time=event.time,
+                                            is_points_event=event.is_points_event,
+                                            display_to_non_members=event.display_to_non_members,
+                                            guest_limit=event.guest_limit,
+                                            prospective_limit=event.prospective_limit,
+                                            original_id=event.id)
+
+    ArchivedQuestion.objects.bulk_create([ArchivedQuestion(event=archived,
+                                                           question_text=question.question_text,
+                                                           display_on_overview=question.display_on_overview,
+                                                           original_id=question.id)
+                                          for question in event.question_set.all()])
+
+    # Rooms one at a time since bulk_create does not give back their ids
+    rooms = {}
+    for room in event.event_room.all():
+        rooms[room.id] = ArchivedRoom.objects.create(event=archived, name=room.name,
+                                                     limit=room.limit, occupancy=room.occupancy)
+
+    entries = Entry.objects.filter(event=event).select_related('student')
+    ArchivedEntry.objects.bulk_create([ArchivedEntry(event=archived,
+                                                     room=rooms[entry.room_id],
+                                                     netid=entry.student.netid,
+                                                     first_name=entry.student.first_name,
+                                                     last_name=entry.student.last_name,
+                                                     year=entry.student.year,
+                                                     student_type=entry.student.cast_class().__name__,
+                                                     guest=entry.guest,
+                                                     answers_json=entry.answers_json)
+                                       for entry in entries])
+
+    event.delete()
+    return archived
+
+def archive_events(before=None, batch_size=BATCH_SIZE):
+    '''
+        Archives every event dated before the given date (default_horizon()
+        if not given), batch_size events per transaction. Returns the number
+        of events archived.
+    '''
+    before = before or default_horizon()
+    event_ids = list(Event.objects.filter(date__lt=before).order_by('date', 'id').values_list('id', flat=True))
+
+    for i in range(0, len(event_ids), batch_size):
+        with transaction.atomic():
+            for event in Event.objects.filter(id__in=event_ids[i:i + batch_size]).order_by('date', 'id'):
+                archive_event(event)
+    return len(event_ids)
@@ -0,0 +1,188 @@
+'''
+    Balances an event's entries across its rooms.
+
+    Each student's entries (with their guests) form a group that has to stay
+    in one room, as ChangeRoomForm requires. Everyone starts where they are.
+    The target fill is the share of all places the event has taken; groups
+    are taken out of the rooms above it, as few as it takes, and placed
+    largest first, each into the room that would be least full afterwards
+    (worst-fit decreasing), preferring the room they came from on a tie. So
+    a balanced event is left alone, only the groups that have to move do,
+    and no room goes over its limit. A group that fits in no room stays
+    where it is, and its places are held before anyone else is placed.
+
+    plan_assignment() is a dry run for previewing; apply_assignment() makes
+    the moves with one UPDATE per room, as long as the plan is still the one
+    that was previewed.
+'''
+import hashlib, math
+
+from django.db import transaction
+
+from events.models import Room, Entry, RoomFullError, WaitlistEntry
+
+
+class AssignmentChanged(Exception):
+    '''
+        Raised by apply_assignment() when the entries or rooms changed since
+        the plan was previewed.
+    '''
+    pass
+
+
+class Assignment(object):
+    '''
+        The result of plan_assignment().
+
+        rooms      - the event's rooms
+        target     - {entry id: room id} for every entry that was placed
+        moves      - {entry id: room id} for the entries that change room
+        loads      - {room id: number of people} after the moves
+        unplaced   - ids of the students whose group fits in no room; their
+                     entries stay where they are
+    '''
+    def __init__(self, rooms):
+        self.rooms = rooms
+        self.target = {}
+        self.moves = {}
+        self.loads = dict((room.id, 0) for room in rooms)
+        self.unplaced = []
+
+    def digest(self):
+        '''
+            Identifies the plan, so that the plan an officer previewed can
+            be checked against the one about to be applied.
+        '''
+        moves = ','.join('%s:%s' % move for move in sorted(self.moves.items()))
+        return hashlib.md5(moves).hexdigest()
+
+def plan_assignment(event):
+    '''
+        Works out a balanced assignment of the event's entries to its rooms,
+        from two queries and without changing anything.
+    '''
+    rooms = list(Room.objects.filter(event=event).order_by('id'))
+
+    # Group each student's entries; an entry with a guest counts for two
+    groups = {}
+    for entry_id, student_id, room_id, guest in Entry.objects.filter(event=event).order_by('id')\
+                                                      .values_list('id', 'student_id', 'room_id', 'guest'):
+        group = groups.setdefault(student_id, {'entries': [], 'size': 0, 'room': room_id})
+        group['entries'].append((entry_id, room_id, 2 if guest else 1))
+        group['size'] += 2 if guest else 1
+
+    # Place everyone; if some groups fit nowhere, hold their current places
+    # and place the others again around them, until no more are left out
+    unplaced = set()
+    while True:
+        assignment = place_groups(rooms, groups, unplaced)
+        if set(assignment.unplaced) == unplaced:
+            return assignment
+        unplaced = set(assignment.unplaced)
+
+def place_groups(rooms, groups, unplaced):
+    '''
+        One pass: takes groups out of the rooms above the target fill and
+        places them worst-fit decreasing, with the groups in unplaced left
+        in their current rooms. Groups that do not fit are added to the
+        Assignment's unplaced.
+    '''
+    assignment = Assignment(rooms)
+    assignment.unplaced = sorted(unplaced)
+
+    # Everyone starts where they are
+    by_room = dict((room.id, []) for room in rooms)
+    moving = []
+    for student_id, group in groups.items():
+        room_ids = set(room_id for entry_id, room_id, num_people in group['entries'])
+        if student_id not in unplaced and (len(room_ids) > 1 or group['room'] not in by_room):
+            # Split across rooms already, so it has to move to be together
+            moving.append((student_id, group))
+            continue
+
+        for entry_id, room_id, num_people in group['entries']:
+            if room_id in assignment.loads:
+                assignment.loads[room_id] += num_people
+        if student_id not in unplaced:
+            by_room[group['room']].append((student_id, group))
+
+    # Take groups out of the rooms above the target fill. A room gives up
+    # the smallest group that brings it down to the target in one go, or
+    # else its largest, so that as few groups as possible move.
+    capacity = sum(room.limit for room in rooms)
+    fill = float(sum(group['size'] for group in groups.values())) / capacity if capacity else 0
+    for room in rooms:
+        target = int(math.ceil(fill * room.limit))
+        staying = sorted(by_room[room.id], key=lambda item: (item[1]['size'], item[0]))
+        while staying and assignment.loads[room.id] > target:
+            excess = assignment.loads[room.id] - target
+            enough = [item for item in staying if item[1]['size'] >= excess]
+            student_id, group = enough[0] if enough else staying[-1]
+            staying.remove((student_id, group))
+            moving.append((student_id, group))
+            assignment.loads[room.id] -= group['size']
+
+        for student_id, group in staying:
+            for entry_id, room_id, num_people in group['entries']:
+                assignment.target[entry_id] = room_id
+
+    for student_id, group in sorted(moving, key=lambda item: (-item[1]['size'], item[0])):
+        best = None
+        for room in rooms:
+            load = assignment.loads[room.id] + group['size']
+            if load > room.limit:
+                continue
+            key = (float(load) / room.limit, room.id != group['room'], room.id)
+            if best is None or key < best[0]:
+                best = (key, room)
+
+        if best is None:
+            assignment.unplaced.append(student_id)
+            continue
+
+        room = best[1]
+        assignment.loads[room.id] += group['size']
+        for entry_id, room_id, num_people in group['entries']:
+            assignment.target[entry_id] = room.id
+            if room_id != room.id:
+                assignment.moves[entry_id] = room.id
+
+    return assignment
+
+def apply_assignment(event, digest=None):
+    '''
+        Plans the assignment again with the event's rooms locked and, if it
+        still matches the previewed plan's digest (when given), moves the
+        entries with one UPDATE per room. Raises AssignmentChanged if the
+        plan changed since the preview, or RoomFullError, changing nothing,
+        if a room would end up over its limit. Returns the Assignment.
+    '''
+    promoted = []
+    with transaction.atomic():
+        locked = Room.lock(Room.objects.filter(event=event).values_list('id', flat=True))
+        assignment = plan_assignment(event)
+        if digest is not None and digest != assignment.digest():
+            raise AssignmentChanged("The entries or rooms of %s changed since the plan was made." % event)
+
+        moving_in = {}
+        for entry_id, room_id in assignment.moves.items():
+            moving_in.setdefault(room_id, []).append(entry_id)
+
+        for room_id, entry_ids in moving_in.items():
+            room = locked[room_id]
+            if assignment.loads[room_id] > room.limit:
+                raise RoomFullError(room, assignment.loads[room_id] - room.occupancy)
+
+        for room_id, entry_ids in moving_in.items():
+            Entry.objects.filter(id__in=entry_ids).update(room=locked[room_id])
+
+        # The loads were counted from the entries, so they are the new
+        # occupancy of every room the plan touched
+        for room_id, room in locked.items():
+            if assignment.loads[room_id] != room.occupancy:
+                Room.objects.filter(pk=room_id).update(occupancy=assignment.loads[room_id])
+        for room_id in locked:
+            promoted += Room.promote_waitlist(room_id)
+
+    WaitlistEntry.notify(promoted)
+    return assignment
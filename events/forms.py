@@ -1,8 +1,9 @@
-import re, random, pdb
+import re, random, pdb, json
 from copy import deepcopy
 
 from collections import OrderedDict
 from django import forms
+from django.db import transaction
 from django.shortcuts import redirect
 from django.forms.extras.widgets import SelectDateWidget
 from django.utils import timezone
@@ -13,7 +14,7 @@ from crispy_forms.bootstrap import (
     PrependedText, PrependedAppendedText, FormActions)
 
 # For some models 
-from events.models import Event, Room, Entry, Answer
+from events.models import Event, Room, RoomFullError, Entry, Answer, WaitlistEntry
 
 from charterclub.models import Member, Student
 from datetime import date, timedelta, datetime
@@ -45,8 +46,11 @@ class EventEntryForm(forms.Form):
         self.fields['room_choice']= forms.ModelChoiceField(required=True,
                                                           widget = forms.Select,
                                                           queryset = self.event.event_room.all(), )
+        self.fields['join_waitlist'] = forms.BooleanField(required=False,
+                                                          label="If the room is full, put me on its waitlist",
+                                                          help_text="You'll get an email if a place opens up and you're let in.")
         # Allow guest option if there is one
-        if self.event.guest_limit != 0 and self.student.__class__.__name__!= 'Prospective':
+        if self.event.guest_limit != 0 and not self.student.is_prospective():
             self.fields['guest_first_name'] = forms.CharField(required=False, 
                                                               help_text="Leave blank if you're not bringing a guest")
 
@@ -67,13 +71,13 @@ class EventEntryForm(forms.Form):
 
 
     def clean_guest_first_name(self):
-        if self.student.__class__.__name__ == 'Prospective':
+        if self.student.is_prospective():
             raise ValidationError('Sorry! Prospectives are not allowed to bring guests.')
     
         return self.cleaned_data['guest_first_name']
 
     def clean_guest_last_name(self):
-        if self.student.__class__.__name__ == 'Prospective':
+        if self.student.is_prospective():
             raise ValidationError('Sorry! Prospectives are not allowed to bring guests.')
         return self.cleaned_data['guest_last_name']
 
@@ -98,16 +102,15 @@ class EventEntryForm(forms.Form):
                 raise forms.ValidationError("You are not allowed to attend events. Sorry :/")
 
         # Block prospectives from RSVP'ing
-        if self.student.__class__.__name__ == 'Prospective':
-            casted_students = [e.student.cast() for e in self.event.entry_event_association.all()]
-            num_prospective = sum([1 if s.__class__.__name__ == 'Prospective' else 0 for s in casted_students])
+        if self.student.is_prospective():
+            num_prospective = self.event.num_prospectives()
             if num_prospective + 1 > self.event.prospective_limit:
                 raise forms.ValidationError("Sorry! The cap for prospectives (%s/%s) has been reached." % (num_prospective, self.event.prospective_limit))
 
         # Check signup times
         senior_year = Student.get_senior_year()
         now = timezone.now()
-        if self.student.__class__.__name__ == 'Prospective':
+        if self.student.is_prospective():
             # Check for the prospective signup time
             signup_t = datetime.combine(self.event.prospective_signup_start, self.event.signup_time)
             signup_t = timezone.make_aware(signup_t, timezone.get_default_timezone())
@@ -161,9 +164,9 @@ class EventEntryForm(forms.Form):
             raise forms.ValidationError("The guest limit is %s. You already have '%s' as your guests" % (self.event.guest_limit, guests))
 
         # Make sure they submit to the same room that they have done so before
-        old_room_q = self.event.entry_event_association.filter(student__netid=self.student.netid)
-        if old_room_q:
-            old_room = old_room_q[0]
+        old_entry = self.event.entry_event_association.filter(student__netid=self.student.netid).first()
+        if old_entry:
+            old_room = old_entry.room
 
             if old_room != room:
                 raise forms.ValidationError("You must accompany your previous guests in room %s. If you want to change rooms, first choose %s then use the '[change_room]' option to move yourself and all of your guests." % (old_room, old_room))
@@ -173,12 +176,22 @@ class EventEntryForm(forms.Form):
         entry = Entry(room=room, student=self.student, guest=self.guest_name, event=self.event)
         self.entry = entry
 
-        # Check if the room will overflow
+        # Check if the room will overflow. If so, they may wait for a place instead.
         if self.num_additional_people() + room.num_people() > room.limit:
+            if self.cleaned_data.get('join_waitlist'):
+                if room.waitlist_room_association.filter(student=self.student, guest=self.guest_name).exists():
+                    raise forms.ValidationError("You are already on the waitlist for %s." % room.name)
+                return self.cleaned_data
             raise forms.ValidationError("The room %s has %s/%s people. You cannot add %s more people." % (room.name, room.num_people(), room.limit, self.num_additional_people()))
 
         return self.cleaned_data
     
+    def join_waitlist(self):
+        answers = dict((question.id, self.cleaned_data.get("question_%s" % i) or '')
+                       for i, question in enumerate(self.question_set))
+        return WaitlistEntry.objects.create(room=self.entry.room, student=self.student, 
+                                            guest=self.guest_name, answers=json.dumps(answers, sort_keys=True))
+
     def num_additional_people(self):
         if self.guest_name:
             return 2
@@ -189,29 +202,52 @@ class EventEntryForm(forms.Form):
 
     def execute_form_information(self):
         '''
-            After form is valid, make the entry
+            After form is valid, make the entry. The room's capacity is checked
+            again under a row lock, since clean() ran without one. If the room
+            is full, the signup goes on its waitlist when they asked for that;
+            otherwise returns False and adds a form error.
         '''
+        self.waitlist_entry = None
         if self.is_valid():
-            self.entry.save()
-
-            # If we already ahve queries with guests, cleanup queries with members but no guests.
-            query_withguest = self.event.entry_event_association.filter(student__netid=self.student.netid).exclude(guest='')
-            query_noguest = self.event.entry_event_association.filter(student__netid=self.student.netid, guest='')
-
-            if query_withguest:
-                for q in query_noguest:
-                    q.delete()
-
-            # Add the new questions
-            for i, question in enumerate(self.question_set):
-                ans = self.cleaned_data.get("question_%s" % i)
-                if ans:
-                    a = Answer(question=question, answer_text=ans)
-                else:
-                    a = Answer(question=question, answer_text='')
-                a.save()
-                self.entry.answers.add(a)
-            self.entry.save()
+            try:
+                with transaction.atomic():
+                    room = Room.lock([self.entry.room_id])[self.entry.room_id]
+                    try:
+                        room.check_space(self.num_additional_people())
+                    except RoomFullError:
+                        if not self.cleaned_data.get('join_waitlist'):
+                            raise
+                        self.waitlist_entry = self.join_waitlist()
+                        return True
+
+                    answer_text = dict((question.id, self.cleaned_data.get("question_%s" % i) or '')
+                                       for i, question in enumerate(self.question_set))
+                    self.entry.set_answers(answer_text)
+                    self.entry.save()
+
+                    # If we already ahve queries with guests, cleanup queries with members but no guests.
+                    query_withguest = self.event.entry_event_association.filter(student__netid=self.student.netid).exclude(guest='')
+                    query_noguest = self.event.entry_event_association.filter(student__netid=self.student.netid, guest='')
+
+                    if query_withguest.exists():
+                        query_noguest.delete()
+
+                    # Add the new questions. The answers are saved one at a time
+                    # because bulk_create() does not give back their ids, but
+                    # they are linked to the entry with a single insert.
+                    answers = []
+                    for question in self.question_set:
+                        a = Answer(question=question, answer_text=answer_text[question.id])
+                        a.save()
+                        answers.append(a)
+
+                    EntryAnswer = Entry.answers.through
+                    EntryAnswer.objects.bulk_create([EntryAnswer(entry=self.entry, answer=a) for a in answers])
+            except RoomFullError as e:
+                self.add_error(None, str(e))
+                return False
+            return True
+        return False
 
             # # Submit the answers to the questions
             # for i, q in enumerate(self.event.question_set.all()):
@@ -265,7 +301,11 @@ class EntryDeletionForm(forms.Form):
 
     def delete_entry(self):
         if self.is_valid():
-            self.entry.delete()
+            with transaction.atomic():
+                Room.lock([self.entry.room_id])
+                self.entry.delete()
+                promoted = Room.promote_waitlist(self.entry.room_id)
+            WaitlistEntry.notify(promoted)
 
 class ChangeAnswersForm(forms.Form):
     '''
@@ -296,14 +336,16 @@ class ChangeAnswersForm(forms.Form):
         return self.cleaned_data
 
     def change_answers(self):
-        # Change the answers to all of the questions
-        for i, q in enumerate(self.question_set):
-            answer_q = self.entry.answers.filter(question=q)
-
-            for answer in answer_q:
+        # Change the answers to all of the questions, with one UPDATE each
+        with transaction.atomic():
+            answer_text = self.entry.get_answers()
+            for i, q in enumerate(self.question_set):
                 ans = self.cleaned_data.get('question_%s' % i)
-                answer.answer_text = ans
-                answer.save()
+                self.entry.answers.filter(question=q).update(answer_text=ans)
+                answer_text[q.id] = ans
+
+            self.entry.set_answers(answer_text)
+            Entry.objects.filter(pk=self.entry.pk).update(answers_json=self.entry.answers_json)
             
 
 class ChangeGuestForm(forms.Form):
@@ -398,7 +440,6 @@ class ChangeGuestForm(forms.Form):
         self.entry.save()
 
     def add_guest(self):
-
         self.entry.guest = self.guest_name
         self.entry.save()
 
@@ -407,14 +448,31 @@ class ChangeGuestForm(forms.Form):
         self.add_guest()
 
     def change_guest(self):
-
-        if self.is_valid():
-            if self.status == 'remove':
-                return self.remove_guest()
-            if self.status == 'swap':
-                return self.swap_guest()
-            if self.status == 'add':
-                return self.add_guest()
+        '''
+            Applies the change under a lock on the entry's room. Adding a
+            guest re-checks the room's capacity; returns False and adds a form
+            error if it filled up since clean().
+        '''
+        if not self.is_valid():
+            return False
+
+        promoted = []
+        try:
+            with transaction.atomic():
+                room = Room.lock([self.entry.room_id])[self.entry.room_id]
+                if self.status == 'remove':
+                    self.remove_guest()
+                    promoted = Room.promote_waitlist(room.pk)
+                if self.status == 'swap':
+                    self.swap_guest()
+                if self.status == 'add':
+                    room.check_space(1)
+                    self.add_guest()
+        except RoomFullError as e:
+            self.add_error(None, str(e))
+            return False
+        WaitlistEntry.notify(promoted)
+        return True
 
 class ChangeRoomForm(forms.Form):
     '''
@@ -437,39 +495,98 @@ class ChangeRoomForm(forms.Form):
         if self.entry.student.netid != self.student.netid:
             raise forms.ValidationError('The student entry does not match the logged in student. Please log in with the student who made the rsvp.')
 
-        if self.is_full():
-            name = self.cleaned_data['room_choice'].name
-            num = self.cleaned_data['room_choice'].num_people()
-            limit = self.cleaned_data['room_choice'].limit
+        room = self.cleaned_data.get('room_choice')
+        if room and self.is_full():
             people = self.additional_people()
-            raise forms.ValidationError('The room %s is has %s/%s people. Cannot add %s to this room. ' % (name, num, limit, people))
+            raise forms.ValidationError('The room %s is has %s/%s people. Cannot add %s to this room. ' % (room.name, room.num_people(), room.limit, people))
 
         return self.cleaned_data
+
+    def student_entries(self):
+        return self.entry.event.entry_event_association.filter(student__netid=self.student.netid)
+
+    def moving_entries(self):
+        '''
+            The student's entries that are not in the chosen room yet. Looked
+            up once per form.
+        '''
+        if not hasattr(self, '_moving_entries'):
+            room = self.cleaned_data['room_choice']
+            self._moving_entries = list(self.student_entries().exclude(room=room))
+        return self._moving_entries
     
     def is_full(self):
         room =  self.cleaned_data['room_choice']
-        total = len(self.additional_people()) + room.num_people()
+        total = sum(entry.num_people() for entry in self.moving_entries()) + room.num_people()
 
         return total > room.limit
 
     def additional_people(self):
-        entry_q = self.entry.event.entry_event_association.filter(student__netid=self.student.netid)
-
         add_people = ["%s %s" % (self.student.first_name, self.student.last_name)]
 
-        for entry in entry_q:
+        for entry in self.moving_entries():
             if entry.guest:
                 add_people.append(entry.guest)
 
         return add_people
 
     def change_room(self):
-        if self.is_valid():
-            room = self.cleaned_data['room_choice']
-            entry_q = self.entry.event.entry_event_association.filter(student__netid=self.student.netid)
-            for entry in entry_q:
-                entry.room = room
-                entry.save()
+        '''
+            Moves all of the student's entries for the event into the chosen
+            room with Room.move_entries(). Returns False and adds a form
+            error if the room filled up since clean().
+        '''
+        if not self.is_valid():
+            return False
+
+        try:
+            Room.move_entries(self.student_entries(), self.cleaned_data['room_choice'])
+        except RoomFullError as e:
+            self.add_error(None, str(e))
+            return False
+        return True
+
+class MoveEntriesForm(forms.Form):
+    '''
+        Lets officers move a selection of entries, or everyone in a room,
+        into another room of the same event from the admin.
+    '''
+    def __init__(self, *args, **kwargs):
+        self.event = kwargs.pop('event')
+
+        super(MoveEntriesForm, self).__init__(*args, **kwargs)
+        rooms = self.event.event_room.all()
+        self.fields['from_room'] = forms.ModelChoiceField(required=False, queryset=rooms,
+                                                          help_text="Move everyone in this room")
+        self.fields['entries'] = forms.ModelMultipleChoiceField(required=False, 
+                                                                widget=forms.CheckboxSelectMultiple,
+                                                                queryset=self.event.entry_event_association.select_related('student', 'room'),
+                                                                help_text="and/or these entries. A student's other entries move with them.")
+        self.fields['to_room'] = forms.ModelChoiceField(queryset=rooms, label="Move to")
+
+    def clean(self):
+        if not self.cleaned_data.get('from_room') and not self.cleaned_data.get('entries'):
+            raise forms.ValidationError('Choose a room or some entries to move.')
+        return self.cleaned_data
+
+    def move_entries(self):
+        '''
+            Moves the chosen entries along with every other entry of the
+            same students, so that nobody is split from their guests. Returns
+            the number of entries moved, or None with a form error if they
+            do not fit in the room.
+        '''
+        from_room = self.cleaned_data.get('from_room')
+        student_ids = set(entry.student_id for entry in self.cleaned_data.get('entries') or [])
+        if from_room:
+            student_ids.update(self.event.entry_event_association.filter(room=from_room).values_list('student_id', flat=True))
+
+        entries = self.event.entry_event_association.filter(student__in=student_ids)
+        try:
+            return Room.move_entries(entries, self.cleaned_data['to_room'])
+        except RoomFullError as e:
+            self.add_error(None, str(e))
+            return None
 
 
 
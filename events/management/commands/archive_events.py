@@ -0,0 +1,43 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from events import archive
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Moves events from past academic years, with their rooms and entries, into the archive tables.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--before',
+            dest='before',
+            help='Archive events before this date (YYYY-MM-DD). Defaults to the start of the previous academic year'),
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=archive.BATCH_SIZE,
+            help='Number of events moved per transaction'),
+        make_option('--dry-run',
+            action='store_true',
+            dest='dry_run',
+            default=False,
+            help='Only report how many events would be archived'),
+    )
+
+    def handle(self, *args, **options):
+        if options.get('before'):
+            before = parse_date(options['before'])
+            if before is None:
+                raise CommandError('--before must be a date like 2015-06-01')
+        else:
+            before = archive.default_horizon()
+
+        if options['dry_run']:
+            num_events = Event.objects.filter(date__lt=before).count()
+            self.stdout.write('Would archive %s events from before %s.' % (num_events, before))
+            return
+
+        num_events = archive.archive_events(before, options['batch_size'])
+        self.stdout.write('Archived %s events from before %s.' % (num_events, before))
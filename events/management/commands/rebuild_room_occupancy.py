@@ -0,0 +1,24 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from events.models import Room
+
+
+class Command(BaseCommand):
+    help = 'Recounts Room.occupancy from the entries in each room.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--event',
+            dest='event',
+            type='int',
+            help='Only rebuild the rooms of the event with this id'),
+    )
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.all()
+        if options.get('event'):
+            rooms = rooms.filter(event=options['event'])
+
+        num_fixed = Room.rebuild_occupancy(rooms)
+        self.stdout.write('Rebuilt %s rooms, %s were out of date.' % (rooms.count(), num_fixed))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def count_occupancy(apps, schema_editor):
+    Room = apps.get_model('events', 'Room')
+    Entry = apps.get_model('events', 'Entry')
+
+    for room in Room.objects.all():
+        entries = Entry.objects.filter(room=room)
+        room.occupancy = entries.count() + entries.exclude(guest='').count()
+        room.save(update_fields=['occupancy'])
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0037_auto_20171004_2116'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='occupancy',
+            field=models.IntegerField(default=0, editable=False),
+            preserve_default=True,
+        ),
+        migrations.RunPython(count_occupancy, noop),
+    ]
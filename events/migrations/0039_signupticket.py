@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0038_room_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignupTicket',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('netid', models.CharField(max_length=100)),
+                ('last_seen', models.DateTimeField()),
+                ('admitted', models.DateTimeField(null=True, blank=True)),
+                ('event', models.ForeignKey(related_name='signup_ticket_association', to='events.Event')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='signupticket',
+            unique_together=set([('event', 'netid')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='signupticket',
+            index_together=set([('event', 'admitted')]),
+        ),
+    ]
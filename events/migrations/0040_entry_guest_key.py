@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from charterclub.models import normalize_name
+
+
+def fill_guest_keys(apps, schema_editor):
+    Entry = apps.get_model('events', 'Entry')
+
+    for entry in Entry.objects.exclude(guest=''):
+        Entry.objects.filter(pk=entry.pk).update(guest_key=normalize_name(entry.guest))
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0039_signupticket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='guest_key',
+            field=models.CharField(db_index=True, max_length=50, editable=False, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(fill_guest_keys, noop),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import datetime
+from django.utils.timezone import utc
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0041_entry_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='date',
+            field=models.DateField(default=datetime.datetime(2017, 10, 5, 1, 16, 21, 37883, tzinfo=utc), verbose_name=b'Date of Event', db_index=True),
+            preserve_default=True,
+        ),
+    ]
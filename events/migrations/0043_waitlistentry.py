@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charterclub', '0011_person_name_key'),
+        ('events', '0042_event_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('guest', models.CharField(max_length=50, blank=True)),
+                ('answers', models.TextField(default=b'{}', blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(related_name='waitlist_room_association', to='events.Room')),
+                ('student', models.ForeignKey(related_name='waitlist_student_association', to='charterclub.Student')),
+            ],
+            options={
+                'ordering': ('created', 'id'),
+            },
+            bases=(models.Model,),
+        ),
+    ]
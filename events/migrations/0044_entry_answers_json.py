@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.db import models, migrations
+
+
+def fill_answers_json(apps, schema_editor):
+    Entry = apps.get_model('events', 'Entry')
+    EntryAnswer = Entry.answers.through
+
+    answers = {}
+    for entry_id, question_id, text in EntryAnswer.objects.values_list('entry_id', 'answer__question_id', 'answer__answer_text'):
+        answers.setdefault(entry_id, {})[question_id] = text
+
+    for entry_id, answer_text in answers.items():
+        Entry.objects.filter(pk=entry_id).update(answers_json=json.dumps(answer_text, sort_keys=True))
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0043_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='answers_json',
+            field=models.TextField(default='{}', editable=False, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(fill_answers_json, noop),
+    ]
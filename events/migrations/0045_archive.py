@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0044_entry_answers_json'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('title', models.CharField(max_length=255)),
+                ('snippet', models.TextField(blank=True)),
+                ('date', models.DateField(db_index=True)),
+                ('time', models.TimeField()),
+                ('is_points_event', models.BooleanField(default=False)),
+                ('display_to_non_members', models.BooleanField(default=True)),
+                ('guest_limit', models.IntegerField(default=1)),
+                ('prospective_limit', models.IntegerField(default=0)),
+                ('original_id', models.IntegerField(unique=True)),
+                ('archived', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('-date', 'title'),
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='ArchivedQuestion',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('question_text', models.CharField(max_length=255)),
+                ('display_on_overview', models.BooleanField(default=True)),
+                ('original_id', models.IntegerField()),
+                ('event', models.ForeignKey(related_name='archived_question_set', to='events.ArchivedEvent')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='ArchivedRoom',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(max_length=127)),
+                ('limit', models.IntegerField()),
+                ('occupancy', models.IntegerField(default=0)),
+                ('event', models.ForeignKey(related_name='archived_room_set', to='events.ArchivedEvent')),
+            ],
+            options={
+                'ordering': ('event', 'name'),
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='ArchivedEntry',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('netid', models.CharField(max_length=100, db_index=True)),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('year', models.IntegerField(null=True, blank=True)),
+                ('student_type', models.CharField(max_length=50, blank=True)),
+                ('guest', models.CharField(max_length=50, blank=True)),
+                ('answers_json', models.TextField(default=b'{}', blank=True)),
+                ('event', models.ForeignKey(related_name='archived_entry_set', to='events.ArchivedEvent')),
+                ('room', models.ForeignKey(related_name='archived_entry_set', to='events.ArchivedRoom')),
+            ],
+            options={
+                'ordering': ('event', 'room', 'last_name', 'first_name'),
+            },
+            bases=(models.Model,),
+        ),
+    ]
@@ -1,14 +1,20 @@
-import urllib, datetime,  re
+import urllib, datetime,  re, json
+from collections import Counter
 from django.utils import timezone
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Prefetch, Q, Sum
+from django.db.models.signals import post_delete
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.mail import send_mail
 from django.contrib import admin
 from  django.core.urlresolvers import reverse
 from django import forms
+from django.contrib.contenttypes.models import ContentType
 
 # from charterclub.models import Member, Student
-from charterclub.models import Member, Student
+from charterclub.models import Member, Student, Prospective, normalize_name
 
 from datetime import time
 now = timezone.now()
@@ -52,27 +58,81 @@ class Entry(models.Model):
                               related_query_name="student",)
     guest  = models.CharField(max_length=50, blank=True,)
 
+    # normalize_name(guest), kept up to date by save()
+    guest_key = models.CharField(max_length=50, db_index=True, editable=False, blank=True)
+
     event = models.ForeignKey('Event', related_name="entry_event_association")
     room = models.ForeignKey('Room', related_name="entry_room_association")
 
     # Answers to any questions
     answers = models.ManyToManyField("Answer")
 
+    # The same answers as a JSON object of {question id: answer text}, so
+    # they can be read without joining through Answer. Written alongside
+    # the Answer rows; use get_answers() and set_answers().
+    answers_json = models.TextField(default='{}', blank=True, editable=False)
+
     class Meta:
             ordering = ("event", "room", "student",)
+            index_together = (("student", "event"), ("event", "room"),)
+
+    def __init__(self, *args, **kwargs):
+        super(Entry, self).__init__(*args, **kwargs)
+
+        # Remember what this entry counts for in the database, so that save()
+        # and deletion know how to adjust the room occupancy counters
+        if self.pk:
+            self._saved_room_id = self.room_id
+            self._saved_num_people = self.num_people()
+        else:
+            self._saved_room_id = None
+            self._saved_num_people = 0
 
     def __unicode__(self):
         if self.guest:
-            return "%s: %s %s with guest %s in %s" % (self.student.cast().__class__.__name__, 
+            return "%s: %s %s with guest %s in %s" % (self.student.cast_class().__name__, 
                                                       self.student.first_name,
                                                       self.student.last_name,
                                                       self.guest,
                                                       self.room.__unicode__())
         else:
-            return "%s: %s %s in %s" % (self.student.cast().__class__.__name__, 
+            return "%s: %s %s in %s" % (self.student.cast_class().__name__, 
                                                       self.student.first_name,
                                                       self.student.last_name,
                                                       self.room.__unicode__())
+
+    def get_answers(self):
+        '''
+            {question id: answer text}
+        '''
+        return dict((int(question_id), text) for question_id, text in json.loads(self.answers_json or '{}').items())
+
+    def set_answers(self, answers):
+        self.answers_json = json.dumps(answers, sort_keys=True)
+
+    def num_people(self):
+        '''
+            The student, plus their guest if they are bringing one.
+        '''
+        if self.guest:
+            return 2
+        return 1
+
+    def save(self, *args, **kwargs):
+        self.guest_key = normalize_name(self.guest)
+
+        with transaction.atomic():
+            super(Entry, self).save(*args, **kwargs)
+
+            if self._saved_room_id != self.room_id:
+                Room.adjust_occupancy(self._saved_room_id, -self._saved_num_people)
+                Room.adjust_occupancy(self.room_id, self.num_people())
+            else:
+                Room.adjust_occupancy(self.room_id, self.num_people() - self._saved_num_people)
+
+        self._saved_room_id = self.room_id
+        self._saved_num_people = self.num_people()
+
     def get_deletion_url(self):
         return urllib.quote('events/delete/' + self.__unicode__().replace("/","|") + "/" + str(self.id))
     
@@ -85,25 +145,23 @@ class Entry(models.Model):
     def get_room_change_url(self):
         return urllib.quote('events/room_change/' + self.__unicode__().replace("/","|") + "/" + str(self.id))
 
+    @staticmethod
+    def get_related_entries(fname, lname):
+        '''
+            All entries made by, or bringing as a guest, the person with this
+            name. Names are compared by normalize_name(), which hits the
+            name_key and guest_key indexes.
+        '''
+        key = normalize_name(fname, lname)
+        return Entry.objects.filter(Q(student__name_key=key) | Q(guest_key=key))
+
     @staticmethod
     def get_future_related_entries(fname, lname):
-        entry_q = Entry.objects.filter(event__date__gte=now, 
-                                       student__first_name__icontains=fname, 
-                                       student__last_name__icontains=lname)
-        guest_q = Entry.objects.filter(event__date__gte=now, 
-                                        guest__icontains=fname).filter(
-                                        guest__icontains=lname)
-        return (entry_q | guest_q).order_by('-event__date')
+        return Entry.get_related_entries(fname, lname).filter(event__date__gte=now).order_by('-event__date')
 
     @staticmethod
     def get_past_related_entries(fname, lname):
-        entry_q = Entry.objects.filter(event__date__lte=now, 
-                                       student__first_name__icontains=fname, 
-                                       student__last_name__icontains=lname)
-        guest_q = Entry.objects.filter(event__date__lte=now, 
-                                        guest__icontains=fname).filter(
-                                        guest__icontains=lname)
-        return (entry_q | guest_q).order_by('-event__date')
+        return Entry.get_related_entries(fname, lname).filter(event__date__lte=now).order_by('-event__date')
 
     @staticmethod
     def get_future_related_entries_for_student(student):
@@ -113,6 +171,16 @@ class Entry(models.Model):
     def get_past_related_entries_for_student(student):
         return Entry.get_past_related_entries(student.first_name, student.last_name)
 
+class RoomFullError(Exception):
+    '''
+        Raised when a room does not have space for the people being added.
+    '''
+    def __init__(self, room, num_people):
+        self.room = room
+        self.num_people = num_people
+        super(RoomFullError, self).__init__("The room %s has %s/%s people. You cannot add %s more people." 
+                                            % (room.name, room.occupancy, room.limit, num_people))
+
 class Room(models.Model):
     '''
         A Room to an event.
@@ -120,6 +188,11 @@ class Room(models.Model):
     name = models.CharField(max_length=127, help_text="Where is the Event Held?")
     limit = models.IntegerField()
     event = models.ForeignKey('Event', related_name="event_room")
+
+    # Denormalized count of people (students and guests) in the room. Kept
+    # up to date by Entry.save() and the post_delete handler below; use
+    # rebuild_occupancy() (manage.py rebuild_room_occupancy) to recount.
+    occupancy = models.IntegerField(default=0, editable=False)
     
     class Meta:
             ordering = ("event", "name", "limit",)
@@ -129,47 +202,130 @@ class Room(models.Model):
 
     def num_people(self):
         '''
-            This method of counting unique names technically does break if 
-            two people have the same name,but that is very rare.
+            Number of people in the room. A guest counts as a person.
         '''
+        return self.occupancy
 
-        ans = 0
+    @staticmethod
+    def lock(room_ids):
+        '''
+            Locks the rooms with select_for_update until the end of the
+            current transaction and returns them as {id: room}. Rows are
+            locked in id order so that two transactions locking the same
+            rooms cannot deadlock. Must be called inside transaction.atomic().
+        '''
+        rooms = Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk')
+        return dict((room.pk, room) for room in rooms)
 
-        for entry in self.entry_room_association.all():
+    def check_space(self, num_people):
+        '''
+            Raises RoomFullError unless num_people more people fit. Only
+            race-free on a room that came from Room.lock().
+        '''
+        if self.occupancy + num_people > self.limit:
+            raise RoomFullError(self, num_people)
 
-            if entry.guest:
-                ans += 2
-            else:
-                ans += 1
-        return ans
-
-        # names = set()
-        # # Count the unique names
-        # for entry in self.entry_room_association.all():
-        #     s = entry.student
-        #     s_name = "%s %s" % (s.first_name, s.last_name)
-        #     g_name = entry.guest
-            
-        #     # clean the names
-        #     s_name_c = re.sub(r'\W+^\s', '', s_name).lower().strip()
-        #     g_name_c = re.sub(r'\W+^\s', '', g_name).lower().strip()
-
-        #     if s_name_c:
-        #         names.add(s_name_c)
-        #     if g_name_c:
-        #         names.add(g_name_c)
-
-        # return len(names)
+    @staticmethod
+    def move_entries(entries, room):
+        '''
+            Moves every entry in the entries queryset into room with a single
+            UPDATE, and moves their share of the occupancy along with them.
+            Raises RoomFullError, leaving everything as it was, if they do
+            not fit. Returns the number of entries moved. Students let in from
+            the waitlists of the rooms they left are emailed after the
+            transaction.
+        '''
+        promoted = []
+        with transaction.atomic():
+            moving = entries.exclude(room=room)
+            rooms = Room.lock(set(moving.order_by().values_list('room_id', flat=True).distinct()) | set([room.pk]))
+
+            # Read the entries again now that their rooms are locked. Like
+            # Entry.num_people(), an entry with a guest counts for two.
+            moving = list(moving.filter(room__in=rooms.keys()).order_by().values_list('id', 'room_id', 'guest'))
+            freed = Counter()
+            for entry_id, room_id, guest in moving:
+                freed[room_id] += 2 if guest else 1
+
+            rooms[room.pk].check_space(sum(freed.values()))
+
+            Entry.objects.filter(id__in=[entry_id for entry_id, room_id, guest in moving]).update(room=room)
+            for room_id, num_people in freed.items():
+                Room.adjust_occupancy(room_id, -num_people)
+            Room.adjust_occupancy(room.pk, sum(freed.values()))
+
+            for room_id in freed:
+                promoted += Room.promote_waitlist(room_id)
+
+        WaitlistEntry.notify(promoted)
+        return len(moving)
+
+    @staticmethod
+    def promote_waitlist(room_id):
+        '''
+            Fills the room's free places from its waitlist. Requests are
+            taken first come first served, skipping any that are too big for
+            the space left. Call it in the same transaction that freed the
+            space. Returns the new entries; pass them to
+            WaitlistEntry.notify() once that transaction has committed.
+        '''
+        promoted = []
+        with transaction.atomic():
+            room = Room.lock([room_id]).get(room_id)
+            if room is None:
+                return promoted
+
+            free = room.limit - room.occupancy
+            for waiting in room.waitlist_room_association.select_related('student', 'room'):
+                if free <= 0:
+                    break
+                if waiting.num_people() > free:
+                    continue
+
+                entry = waiting.admit()
+                if entry:
+                    free -= waiting.num_people()
+                    promoted.append(entry)
+        return promoted
+
+    @staticmethod
+    def adjust_occupancy(room_id, delta):
+        '''
+            Atomically moves a room's occupancy by delta.
+        '''
+        if room_id is not None and delta:
+            Room.objects.filter(pk=room_id).update(occupancy=F('occupancy') + delta)
+
+    @staticmethod
+    def rebuild_occupancy(rooms=None):
+        '''
+            Recounts the occupancy of a queryset of rooms (all of them by
+            default) from their entries. Returns the number of rooms that
+            were off.
+        '''
+        if rooms is None:
+            rooms = Room.objects.all()
+
+        entries = Entry.objects.filter(room__in=rooms).order_by()
+        people = dict(entries.values('room').annotate(n=Count('id')).values_list('room', 'n'))
+        guests = dict(entries.exclude(guest='').values('room').annotate(n=Count('id')).values_list('room', 'n'))
+
+        num_fixed = 0
+        with transaction.atomic():
+            for room_id, occupancy in rooms.values_list('id', 'occupancy'):
+                actual = people.get(room_id, 0) + guests.get(room_id, 0)
+                if actual != occupancy:
+                    Room.objects.filter(pk=room_id).update(occupancy=actual)
+                    num_fixed += 1
+        return num_fixed
         
     def which_entries(self, student):
         '''
             Get all the entries that this person is a part of.
         '''
 
-        entry_q = self.entry_room_association.filter(student__netid=student.netid)
-        guest_q = self.entry_room_association.filter(guest__icontains=student.first_name)\
-                                              .filter(guest__icontains=student.last_name)
-        return entry_q | guest_q
+        return self.entry_room_association.filter(Q(student__netid=student.netid) | 
+                                                  Q(guest_key=student.name_key))
 
 # An event contains instances of rooms
 DEFAULT_TIME = time(hour=17, minute=0, second=0)
@@ -233,7 +389,7 @@ class Event(models.Model):
                                       help_text="0 = No guests allowed. -1 = As many guests as they can.",
                                       default=1)
     # Event time Some times
-    date   = models.DateField("Date of Event", default=now)
+    date   = models.DateField("Date of Event", default=now, db_index=True)
     time = models.TimeField("Time of Event", help_text="IMPORTANT. THIS IS IN MILITARY TIME.", 
                             default=DEFAULT_TIME)
 
@@ -265,6 +421,50 @@ class Event(models.Model):
 
     def get_officer_overview_url(self):
         return urllib.quote('events/events_officer_overview/' + self.__unicode__().replace("/","|") + "/" + str(self.id))        
+
+    def get_room_occupancy_url(self):
+        return 'events/room_occupancy/%s' % self.id
+
+    def get_officer_export_url(self):
+        return urllib.quote('events/officer_export/' + self.__unicode__().replace("/","|") + "/" + str(self.id))
+
+    def get_roster(self):
+        '''
+            The seating chart for the officer overview and export, from a
+            fixed number of queries however big the event is. Returns
+            (questions, [(room, [(entry, [(question, answer text)])])]), with
+            each entry's answers lined up with questions.
+        '''
+        questions = list(self.question_set.order_by('id'))
+
+        entries = Entry.objects.select_related('student')
+        rooms = self.event_room.prefetch_related(Prefetch('entry_room_association', queryset=entries))
+
+        roster = []
+        for room in rooms:
+            rows = []
+            for entry in room.entry_room_association.all():
+                answer_text = entry.get_answers()
+                rows.append((entry, [(question, answer_text.get(question.id, '')) for question in questions]))
+            roster.append((room, rows))
+        return questions, roster
+
+    def iter_roster(self):
+        '''
+            The seating chart for the CSV export, one entry at a time.
+            Returns (questions, rows), where rows is a generator of
+            (room, entry, [answer text]) with the answers lined up with
+            questions, read from one query through .iterator() so entries are
+            not all held in memory at once.
+        '''
+        questions = list(self.question_set.order_by('id'))
+        entries = self.entry_event_association.select_related('student', 'room')
+
+        def rows():
+            for entry in entries.iterator():
+                answer_text = entry.get_answers()
+                yield entry.room, entry, [answer_text.get(question.id, '') for question in questions]
+        return questions, rows()
     
     def has_student(self, student):
         '''
@@ -281,10 +481,8 @@ class Event(models.Model):
             Get all the entries that this person (a student object) is a part of.
         '''
 
-        entry_q = self.entry_event_association.filter(student__netid=student.netid)
-        guest_q = self.entry_event_association.filter(guest__icontains=student.first_name.lower())\
-                                              .filter(guest__icontains=student.last_name.lower())
-        return entry_q | guest_q
+        return self.entry_event_association.filter(Q(student__netid=student.netid) | 
+                                                   Q(guest_key=student.name_key))
 
     def which_room(self, student):
         '''
@@ -305,12 +503,8 @@ class Event(models.Model):
         if not fname or not lname:
             return []
 
-        entry_q = self.entry_event_association.filter(student__first_name__icontains=fname.lower())\
-                                               .filter(student__last_name__icontains=lname.lower())
-        guest_q = self.entry_event_association.filter(guest__icontains=fname.lower())\
-                                              .filter(guest__icontains=lname.lower())
-
-        return entry_q | guest_q
+        key = normalize_name(fname, lname)
+        return self.entry_event_association.filter(Q(student__name_key=key) | Q(guest_key=key))
 
     def get_guests(self, student):
         '''
@@ -319,18 +513,39 @@ class Event(models.Model):
 
         return [entry.guest.strip() for entry in self.entry_event_association.filter(student__netid=student.netid) if entry.guest.strip()]
 
+    @staticmethod
+    def rsvp_map_for(student, events):
+        '''
+            Batched has_student() and get_guests() for a list of events, from
+            a single query. Returns {event id: (attending, [guest names])}.
+        '''
+        event_ids = [event.id for event in events]
+        rsvp_map = dict((event_id, (False, [])) for event_id in event_ids)
+        if not event_ids:
+            return rsvp_map
+
+        is_student = Q(student__netid=student.netid)
+        is_guest = Q(guest_key=student.name_key)
+        entry_q = Entry.objects.filter(event__in=event_ids).filter(is_student | is_guest)\
+                               .values_list('event_id', 'student__netid', 'guest')
+
+        for event_id, netid, guest in entry_q:
+            attending, guests = rsvp_map[event_id]
+            if netid == student.netid and guest.strip():
+                guests.append(guest.strip())
+            rsvp_map[event_id] = (True, guests)
+        return rsvp_map
+
     def current_num_participants(self):
-        current_num = [room.num_people() for room in self.event_room.all()]
-        return sum(current_num)
+        return self.event_room.aggregate(total=Sum('occupancy'))['total'] or 0
 
     def max_num_participants(self):
         max_num = [room.limit for room in self.event_room.all()]
         return sum(max_num)
 
     def num_prospectives(self):
-        all_students = [e.student.cast() for e in self.entry_event_association.all()]
-        prospectives = [s for s in all_students if s.__class__.__name__ == 'Prospective']
-        return len(prospectives)
+        prospective_type = ContentType.objects.get_for_model(Prospective)
+        return self.entry_event_association.filter(student__real_type=prospective_type).count()
 
 
     def __unicode__(self):
@@ -340,9 +555,238 @@ class Event(models.Model):
         ordering = ("title",)
 
 
+def release_room_occupancy(sender, instance, **kwargs):
+    '''
+        Frees the entry's spots when it is deleted. This is a signal rather
+        than Entry.delete() so that queryset and cascade deletes count too.
+    '''
+    Room.adjust_occupancy(instance._saved_room_id, -instance._saved_num_people)
 
+post_delete.connect(release_room_occupancy, sender=Entry)
 
-    
-    
 
+class SignupTicket(models.Model):
+    '''
+        A student's place in the admission queue for an event's signup page
+        during a signup rush. See events/admission.py.
+    '''
+    event = models.ForeignKey('Event', related_name="signup_ticket_association")
+    netid = models.CharField(max_length=100)
+    last_seen = models.DateTimeField()
+
+    # Set once the ticket is let through to the signup form
+    admitted = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = (('event', 'netid'),)
+        index_together = (('event', 'admitted'),)
+
+    def __unicode__(self):
+        return "%s in line for %s" % (self.netid, self.event)
+
+
+class WaitlistEntry(models.Model):
+    '''
+        A signup waiting for space in a full room. Room.promote_waitlist()
+        turns it into an Entry when space frees up.
+    '''
+    room = models.ForeignKey('Room', related_name="waitlist_room_association")
+    student = models.ForeignKey('charterclub.Student', related_name="waitlist_student_association")
+    guest = models.CharField(max_length=50, blank=True)
+
+    # The answers from the signup form, as JSON {question id: answer text}
+    # like Entry.answers_json
+    answers = models.TextField(default='{}', blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("created", "id")
+
+    def __unicode__(self):
+        if self.guest:
+            return "%s with guest %s waiting for %s" % (self.student, self.guest, self.room.name)
+        return "%s waiting for %s" % (self.student, self.room.name)
+
+    def get_cancel_url(self):
+        return 'events/waitlist_cancel/%s' % self.id
+
+    def get_answers(self):
+        '''
+            {question id: answer text}
+        '''
+        return dict((int(question_id), text) for question_id, text in json.loads(self.answers or '{}').items())
+
+    def num_people(self):
+        if self.guest:
+            return 2
+        return 1
+
+    def position(self):
+        '''
+            1 for the first request in line for the room.
+        '''
+        return WaitlistEntry.objects.filter(room=self.room_id, id__lte=self.id).count()
+
+    def is_allowed(self, event):
+        '''
+            Whether the signup form would still take this request: signups
+            are open, the guest fits in the guest limit, the student's other
+            entries are in the same room, and a sophomore fits in the
+            prospectives limit.
+        '''
+        signup_end = datetime.datetime.combine(event.signup_end_time, event.signup_time)
+        signup_end = timezone.make_aware(signup_end, timezone.get_default_timezone())
+        now = timezone.now()
+        if now > signup_end or event.date < timezone.localtime(now).date():
+            return False
+
+        entries = list(event.entry_event_association.filter(student=self.student_id).values_list('room_id', 'guest'))
+        if any(room_id != self.room_id for room_id, guest in entries):
+            return False
+        if self.guest and len([guest for room_id, guest in entries if guest.strip()]) >= event.guest_limit:
+            return False
+        if not entries and self.student.is_prospective() and event.num_prospectives() >= event.prospective_limit:
+            return False
+        return True
+
+    def admit(self):
+        '''
+            Makes the entry this request was waiting for. The caller must have
+            checked that it fits. Returns None, and drops the request, if the
+            student already has that entry or the signup form would no
+            longer take it. Send WaitlistEntry.notify() for the new entry
+            once the transaction has committed.
+        '''
+        event = self.room.event
+        entry_q = event.entry_event_association.filter(student=self.student_id)
+
+        self.delete()
+        if entry_q.filter(guest=self.guest).exists() or not self.is_allowed(event):
+            return None
+
+        answer_text = self.get_answers()
+
+        entry = Entry(student=self.student, event=event, room=self.room, guest=self.guest)
+        entry.set_answers(answer_text)
+        entry.save()
+
+        # Like a signup, an entry with a guest replaces one without
+        if self.guest:
+            entry_q.filter(guest='').delete()
+
+        answers = [Answer.objects.create(question_id=question_id, answer_text=text) 
+                   for question_id, text in sorted(answer_text.items())]
+        EntryAnswer = Entry.answers.through
+        EntryAnswer.objects.bulk_create([EntryAnswer(entry=entry, answer=a) for a in answers])
+        return entry
+
+    @staticmethod
+    def notify(entries):
+        '''
+            Emails the students whose waitlist requests became the entries.
+            Call it after the transaction that admitted them has committed,
+            so no room is locked while the mail goes out and nobody is told
+            about an entry that was rolled back.
+        '''
+        for entry in entries:
+            send_mail("You're in: %s" % entry.event.title,
+                      "A place opened up in %s, so your RSVP for %s has gone through. "
+                      "You can change or cancel it from the event's signup page." % (entry.room.name, entry.event.title),
+                      settings.DEFAULT_FROM_EMAIL, ["%s@princeton.edu" % entry.student.netid], fail_silently=True)
+
+
+# Archive tables. Events from past academic years are moved here by
+# manage.py archive_events (see events/archive.py) so that the live Event,
+# Room and Entry tables only hold recent seasons. Rows are flattened copies:
+# entries keep the student's name and netid rather than a foreign key.
+
+class ArchivedEvent(models.Model):
+    '''
+        A past event, moved out of the live tables.
+    '''
+    title = models.CharField(max_length=255)
+    snippet = models.TextField(blank=True)
+    date = models.DateField(db_index=True)
+    time = models.TimeField()
+    is_points_event = models.BooleanField(default=False)
+    display_to_non_members = models.BooleanField(default=True)
+    guest_limit = models.IntegerField(default=1)
+    prospective_limit = models.IntegerField(default=0)
+
+    # The id the event had in the live tables
+    original_id = models.IntegerField(unique=True)
+    archived = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-date", "title",)
+
+    def __unicode__(self):
+        return "%s, %s" % (self.title, self.date.isoformat()[:10])
+
+    def get_archive_url(self):
+        return 'events/archive/%s' % self.id
+
+    def get_roster(self):
+        '''
+            Same shape as Event.get_roster(), for the archived overview.
+        '''
+        questions = list(self.archived_question_set.order_by('original_id'))
+        rooms = self.archived_room_set.prefetch_related('archived_entry_set')
+
+        roster = []
+        for room in rooms:
+            rows = []
+            for entry in room.archived_entry_set.all():
+                answer_text = entry.get_answers()
+                rows.append((entry, [(question, answer_text.get(question.original_id, '')) for question in questions]))
+            roster.append((room, rows))
+        return questions, roster
+
+class ArchivedQuestion(models.Model):
+    event = models.ForeignKey('ArchivedEvent', related_name="archived_question_set")
+    question_text = models.CharField(max_length=255)
+    display_on_overview = models.BooleanField(default=True)
+
+    # Archived answers are keyed by the question's live id
+    original_id = models.IntegerField()
+
+    def __unicode__(self):
+        return "%s %s" % (self.event, self.question_text)
+
+class ArchivedRoom(models.Model):
+    event = models.ForeignKey('ArchivedEvent', related_name="archived_room_set")
+    name = models.CharField(max_length=127)
+    limit = models.IntegerField()
+    occupancy = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ("event", "name",)
+
+    def __unicode__(self):
+        return "%s %s/%s" % (self.name, self.occupancy, self.limit)
+
+class ArchivedEntry(models.Model):
+    event = models.ForeignKey('ArchivedEvent', related_name="archived_entry_set")
+    room = models.ForeignKey('ArchivedRoom', related_name="archived_entry_set")
+
+    netid = models.CharField(max_length=100, db_index=True)
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    year = models.IntegerField(null=True, blank=True)
+    # Member, Prospective, Officer...
+    student_type = models.CharField(max_length=50, blank=True)
+    guest = models.CharField(max_length=50, blank=True)
+
+    # {question id: answer text}, as in Entry.answers_json
+    answers_json = models.TextField(default='{}', blank=True)
+
+    class Meta:
+        ordering = ("event", "room", "last_name", "first_name",)
+
+    def __unicode__(self):
+        if self.guest:
+            return "%s: %s %s with guest %s" % (self.student_type, self.first_name, self.last_name, self.guest)
+        return "%s: %s %s" % (self.student_type, self.first_name, self.last_name)
 
+    def get_answers(self):
+        return dict((int(question_id), text) for question_id, text in json.loads(self.answers_json or '{}').items())
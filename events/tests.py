@@ -1,3 +1,82 @@
+from django.utils import timezone
+from datetime import timedelta
+
 from django.test import TestCase
 
-# Create your tests here.
+from charterclub.models import Student
+from charterclub.testing import QueryPlanTestCase
+from events.assignment import plan_assignment, apply_assignment, AssignmentChanged
+from events.models import Event, Room, Entry
+
+class EventQueryPlanTest(QueryPlanTestCase):
+    '''
+        The events pages' hot queries should be served by an index.
+    '''
+
+    def test_events_list_date_range(self):
+        now = timezone.now()
+        self.assertUsesIndex(Event.objects.filter(date__gte=now).order_by("date"))
+        self.assertUsesIndex(Event.objects.filter(date__gte=now - timedelta(weeks=52), date__lte=now))
+
+    def test_entries_for_student_in_event(self):
+        self.assertUsesIndex(Entry.objects.filter(event=1, student__netid='netid'))
+
+    def test_entries_in_room(self):
+        self.assertUsesIndex(Entry.objects.filter(room=1))
+
+    def test_entries_by_guest_name(self):
+        self.assertUsesIndex(Entry.objects.filter(event=1, guest_key='firstlast'))
+
+
+class AssignmentTest(TestCase):
+    '''
+        Balancing the rooms never puts a room over its limit.
+    '''
+
+    def setUp(self):
+        self.event = Event.objects.create(title='Formal', snippet='')
+        self.r1 = Room.objects.create(event=self.event, name='r1', limit=6)
+        self.r2 = Room.objects.create(event=self.event, name='r2', limit=4)
+
+        # Two groups of three in r1 and two groups of two in r2, both full
+        for i, room in enumerate([self.r1, self.r1, self.r2, self.r2]):
+            student = Student.objects.create(first_name='First', last_name='Last%s' % i, netid='student%s' % i, year=2017)
+            Entry.objects.create(event=self.event, student=student, room=room, guest='Guest')
+            if room == self.r1:
+                Entry.objects.create(event=self.event, student=student, room=room)
+        Room.rebuild_occupancy()
+
+    def test_full_rooms_stay_within_their_limits(self):
+        assignment = plan_assignment(self.event)
+        for room in assignment.rooms:
+            self.assertLessEqual(assignment.loads[room.id], room.limit)
+
+        apply_assignment(self.event, assignment.digest())
+        for room in Room.objects.filter(event=self.event):
+            self.assertLessEqual(room.occupancy, room.limit)
+            self.assertEqual(room.occupancy, assignment.loads[room.id])
+
+    def test_balanced_event_is_left_alone(self):
+        Entry.objects.filter(event=self.event).delete()
+        Room.objects.filter(pk__in=[self.r1.pk, self.r2.pk]).update(limit=10)
+        for i in range(10):
+            student = Student.objects.create(first_name='First', last_name='Single%s' % i, netid='single%s' % i, year=2017)
+            Entry.objects.create(event=self.event, student=student, room=self.r1 if i % 2 else self.r2)
+
+        assignment = plan_assignment(self.event)
+        self.assertEqual(assignment.moves, {})
+        self.assertEqual(sorted(assignment.loads.values()), [5, 5])
+
+    def test_moves_only_what_it_has_to(self):
+        Room.objects.filter(pk=self.r2.pk).update(limit=10)
+
+        # r1 is at 6/6 and r2 at 4/10, so one group of three moves over
+        assignment = plan_assignment(self.event)
+        self.assertEqual(len(assignment.moves), 2)
+        self.assertEqual(assignment.loads, {self.r1.pk: 3, self.r2.pk: 7})
+
+    def test_refuses_a_changed_plan(self):
+        digest = plan_assignment(self.event).digest()
+        Room.objects.filter(pk=self.r2.pk).update(limit=10)
+        self.assertRaises(AssignmentChanged, apply_assignment, self.event, digest)
+        self.assertEqual(Entry.objects.filter(room=self.r1).count(), 4)
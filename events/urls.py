@@ -30,10 +30,30 @@ urlpatterns = patterns('',
         r'^room_change/(.+)/([0-9]+)',
         'events.views.entry_room_change', 
         name='entry_room_change'),
+    url(
+        r'^waitlist_cancel/([0-9]+)$',
+        'events.views.waitlist_cancel', 
+        name='waitlist_cancel'),
+    url(
+        r'^room_occupancy/([0-9]+)$',
+        'events.views.room_occupancy', 
+        name='room_occupancy'),
     url(
         r'^events_officer_overview/(.+)/([0-9]+)',
         'events.views.events_officer_overview', 
         name='events_officer_overview'),
+    url(
+        r'^officer_export/(.+)/([0-9]+)',
+        'events.views.events_officer_export', 
+        name='events_officer_export'),
+    url(
+        r'^archive/$',
+        'events.views.events_archive', 
+        name='events_archive'),
+    url(
+        r'^archive/([0-9]+)$',
+        'events.views.events_archive_detail', 
+        name='events_archive_detail'),
 
 #     url(
 #         
@@ -1,8 +1,9 @@
 # Some standard imports here
-import datetime, urllib, pdb
+import datetime, urllib, pdb, json, csv, hashlib
 
 from django.shortcuts import redirect
-from django.http import HttpResponse, HttpResponseRedirect
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, HttpResponseRedirect, StreamingHttpResponse
 from django.utils.dateparse import parse_date
 from django.utils import timezone
 
@@ -13,7 +14,8 @@ import charterclub
 import charterclub.permissions as permissions
 from charterclub.permissions import render
 
-from events.models import Event, Entry
+from events import admission
+from events.models import Event, Room, Entry, WaitlistEntry, ArchivedEvent
 from events.forms import EventEntryForm, EntryDeletionForm, ChangeAnswersForm, ChangeGuestForm, ChangeRoomForm
 
 
@@ -38,23 +40,19 @@ def events_list(request):
     # If there is a login, setup the proper page for him
     student = permissions.get_student(request)
 
+    future_events = list(future_events)
+    past_events = list(past_events)
     if student:
-        future_events_q = [e.has_student(student) for e in future_events]
-        future_rsvp_guests = [e.get_guests(student) for e in future_events]
-        past_events_q     = [e.has_student(student) for e in past_events]
-        past_rsvp_guests = [e.get_guests(student) for e in past_events]
+        rsvp_map = Event.rsvp_map_for(student, future_events + past_events)
     else:
-        future_events_q = [False for e in future_events]
-        future_rsvp_guests = [[] for e in future_events]
-        past_events_q = [False for e in past_events]
-        past_rsvp_guests = [[] for e in past_events]
+        rsvp_map = dict((e.id, (False, [])) for e in future_events + past_events)
 
         
     return render(request, 'events/events_list.html', {
       'error': '',
       'netid': permissions.get_username(request),
-      'future_events': zip(future_events, future_events_q, future_rsvp_guests),
-      'past_events' : zip(past_events, past_events_q, past_rsvp_guests),
+      'future_events': [(e,) + rsvp_map[e.id] for e in future_events],
+      'past_events' : [(e,) + rsvp_map[e.id] for e in past_events],
     })  
 
 @permissions.student
@@ -77,7 +75,7 @@ def events_signup(request, name, id):
         e = e[0]
 
     # Bounce Sophomores
-    if not e.display_to_non_members and s.__class__.__name__ == 'Prospective':
+    if not e.display_to_non_members and s.is_prospective():
         subject = 'Oops. %s' % urllib.unquote(name)
         body = "This event is not open for sophomores :/"
 
@@ -86,33 +84,95 @@ def events_signup(request, name, id):
                 'body'    : body,
     })
 
+    # During their class's signup rush, only let a few students at a time
+    # who have not signed up yet at the form
+    rush = admission.in_rush(e, s)
+    if rush:
+        try:
+            position = admission.admit(e, s.netid)
+        except admission.QueueFull:
+            position = None
+        if position != 0:
+            return signup_queue(request, e, position)
+
     # If we find the event, then send them the form
     if request.method == 'POST':
         form = EventEntryForm(request.POST, event=e, student=s)
 
-        if form.is_valid():
-            form.execute_form_information()
+        if form.execute_form_information() and rush:
+            admission.release(e, s.netid)
     else:
         form = EventEntryForm(event=e,student=s)
 
     rsvp_entries = e.which_entries(s)
     rsvp_guests = e.get_guests(s)
+    waitlist_entries = s.waitlist_student_association.filter(room__event=e).select_related('room')
     return render(request, 'events/events_signup.html', {
       'form' : form,
       'event' : e,
       'rsvp_entries': rsvp_entries,
       'rsvp_guests': rsvp_guests,
+      'waitlist_entries': waitlist_entries,
+      'occupancy_poll': getattr(settings, 'ROOM_OCCUPANCY_POLL', 5),
 
     })  
 
+def signup_queue(request, event, position):
+    '''
+        The page shown instead of the signup form while the student waits
+        in line. It refreshes itself, or answers with JSON for ajax polls.
+        A position of None means the line is full.
+    '''
+    status = 503 if position is None else 200
+
+    if request.is_ajax():
+        response = HttpResponse(json.dumps({'position': position, 'retry': admission.POLL}),
+                                content_type='application/json', status=status)
+    else:
+        response = render(request, 'events/signup_queue.html', {
+          'event': event,
+          'position': position,
+          'retry': admission.POLL,
+        }, status=status)
+
+    response['Retry-After'] = admission.POLL
+    return response
+
+@permissions.student
+def room_occupancy(request, id):
+    '''
+        The event's rooms as JSON, for the signup page to keep its room
+        counts current. Answers at once with an ETag of the counts; a
+        request whose If-None-Match still matches gets an empty 304. The
+        page polls every ROOM_OCCUPANCY_POLL seconds.
+    '''
+    event = Event.objects.filter(id=id).first()
+    if not event:
+        raise Http404
+
+    # Same rule as events_signup
+    if not event.display_to_non_members and permissions.get_student(request).is_prospective():
+        return HttpResponseForbidden()
+
+    rooms = Room.objects.filter(event=event).order_by('id').values('id', 'name', 'occupancy', 'limit')
+    body = json.dumps({'rooms': list(rooms)})
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+
+    if etag == request.META.get('HTTP_IF_NONE_MATCH'):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 @permissions.officer
 def events_officer_overview(request, name, id):
     '''
         Display all the data on this event
     '''
     event = Event.objects.filter(id=id)
-    netid = permissions.get_username(request)
-    officer = Officer.objects.filter(netid=netid)
+    officer = permissions.get_identity(request).officer
 
     # If we don't find the event then send them the error message
     if not event:  
@@ -125,12 +185,89 @@ def events_officer_overview(request, name, id):
     else:
         event = event[0]
 
+    questions, roster = event.get_roster()
     return render(request, 'events/events_officer_overview.html', {
       'event' : event,
       'officer': officer,
+      'questions': questions,
+      'roster': roster,
 
     })  
 
+class Echo(object):
+    '''
+        A file-like object that hands back what is written to it, so that
+        csv.writer can produce one row at a time for a streaming response.
+    '''
+    def write(self, value):
+        return value
+
+@permissions.officer
+def events_officer_export(request, name, id):
+    '''
+        Download the event's seating chart and answers as a CSV file. Rows
+        are read from the database and written out as the response is sent
+        (see Event.iter_roster) rather than built up front.
+    '''
+    event = Event.objects.filter(id=id).first()
+
+    if not event:
+        subject = 'The signup for this event %s is not available' % urllib.unquote(name)
+        body = "Check back with us."
+        return render(request, 'standard_message.html', {
+                'subject' : subject,
+                'body'    : body,
+        })
+
+    questions, roster = event.iter_roster()
+
+    def rows():
+        yield ['Room', 'Member', 'Netid', 'Guest'] + [question.question_text for question in questions]
+        for room, entry, answers in roster:
+            yield [room.name, unicode(entry.student), entry.student.netid, entry.guest.title()] + answers
+
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse((writer.writerow([unicode(cell).encode('utf-8') for cell in row]) for row in rows()),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="event-%s.csv"' % event.id
+    return response
+
+@permissions.officer
+def events_archive(request):
+    '''
+        Read-only list of the events moved out by manage.py archive_events.
+    '''
+    year = request.GET.get('year', '')
+    archived = ArchivedEvent.objects.all()
+    if year.isdigit():
+        archived = archived.filter(date__year=int(year))
+
+    return render(request, 'events/events_archive.html', {
+      'archived_events': archived,
+      'years': ArchivedEvent.objects.dates('date', 'year', order='DESC'),
+      'year': year,
+    })
+
+@permissions.officer
+def events_archive_detail(request, id):
+    '''
+        Read-only seating chart and answers of an archived event.
+    '''
+    event = ArchivedEvent.objects.filter(id=id).first()
+
+    if not event:
+        return render(request, 'standard_message.html', {
+                'subject' : 'This archived event does not exist',
+                'body'    : '',
+        })
+
+    questions, roster = event.get_roster()
+    return render(request, 'events/events_archive_detail.html', {
+      'event' : event,
+      'questions': questions,
+      'roster': roster,
+    })
+
 @permissions.student
 def entry_delete(request, name, entry_id):
     e = Entry.objects.filter(id=int(entry_id))
@@ -164,6 +301,26 @@ def entry_delete(request, name, entry_id):
         })
 
 
+@permissions.student
+def waitlist_cancel(request, waitlist_id):
+    '''
+        Takes the student off a waitlist. Only on POST, from the button on
+        the signup page.
+    '''
+    s = permissions.get_student(request)
+    waiting = WaitlistEntry.objects.filter(id=waitlist_id, student=s).select_related('room__event').first()
+
+    if not waiting:
+        return render(request, 'standard_message.html', {
+                'subject' : 'You are not on this waitlist',
+                'body'    : "You may already have been let in, or taken off it.",
+        })
+
+    if request.method == 'POST':
+        waiting.delete()
+    return redirect('/' + waiting.room.event.get_signup_url())
+
+
 @permissions.student
 def entry_change_answers(request, name, entry_id):
     e = Entry.objects.filter(id=int(entry_id))
@@ -217,8 +374,7 @@ def entry_guest_change(request, name, entry_id):
     if request.method == 'POST':
         form = ChangeGuestForm(request.POST, entry=e, student=s)
 
-        if form.is_valid():
-            form.change_guest()
+        if form.change_guest():
             return redirect('/' + e.event.get_signup_url())
     else:
         form = ChangeGuestForm(entry=e,student=s)
@@ -249,8 +405,7 @@ def entry_room_change(request, name, entry_id):
     if request.method == 'POST':
         form = ChangeRoomForm(request.POST, entry=e, student=s)
 
-        if form.is_valid():
-            form.change_room()
+        if form.change_room():
             return redirect('/' + e.event.get_signup_url())
     else:
         form = ChangeRoomForm(entry=e,student=s)
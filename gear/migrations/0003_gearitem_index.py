@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gear', '0002_auto_20161022_1341'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='gearitem',
+            index_together=set([('name', 'sizes')]),
+        ),
+    ]
@@ -11,4 +11,5 @@ class GearItem(models.Model):
 
     class Meta:
         ordering = ("name", "description")
+        index_together = (("name", "sizes"),)
 
@@ -0,0 +1,13 @@
+from charterclub.testing import QueryPlanTestCase
+from gear.models import GearItem
+
+class GearItemQueryPlanTest(QueryPlanTestCase):
+    '''
+        Items are looked up by name, and by name and size, when building orders.
+    '''
+
+    def test_name_and_size(self):
+        self.assertUsesIndex(GearItem.objects.filter(name='Sweatshirt', sizes='M'))
+
+    def test_name(self):
+        self.assertUsesIndex(GearItem.objects.filter(name='Sweatshirt'))
@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.conf.urls import patterns, url
+from django.http import HttpResponseRedirect
+from django.shortcuts import render
 from kitchen.models import Meal, Brunch, Lunch, Dinner
+from kitchen.forms import MealScheduleForm
 from recruitment.prospective_admin_inline import ProspectiveMealEntryInline
 
 # Register your models here.
@@ -21,10 +25,37 @@ class MealAdmin(admin.ModelAdmin):
     inlines = [ProspectiveMealEntryInline]
 
     def cast_unicode(self, obj):
-        return obj.cast().__unicode__()
+        return obj.__unicode__()
 
     def sophs(self, obj):
         return obj.num_of_sophomores()
+
+    def get_urls(self):
+        urls = super(MealAdmin, self).get_urls()
+        my_urls = patterns("",
+            url(r'^schedule/$', self.admin_site.admin_view(self.upload_schedule)),
+        )
+
+        return my_urls + urls
+
+    def upload_schedule(self, request):
+        '''
+            Creates a semester of brunches, lunches and dinners at once from a
+            CSV file or recurrence rules (see kitchen/schedule.py).
+        '''
+        if request.method == 'POST':
+            form = MealScheduleForm(request.POST, request.FILES)
+            if form.is_valid():
+                num_created, num_skipped = form.create_meals()
+                self.message_user(request, "Created %s meals, skipped %s that already existed." % (num_created, num_skipped))
+                return HttpResponseRedirect('../')
+        else:
+            form = MealScheduleForm()
+
+        return render(request, 'admin/kitchen/meal_schedule.html', {
+            'form': form,
+            'opts': self.model._meta,
+        })
     
 # admin.site.register(Meal, MealAdmin)
 class BrunchAdmin(MealAdmin):
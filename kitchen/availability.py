@@ -0,0 +1,93 @@
+'''
+    Sophomore availability of the upcoming meals, for the meal signup
+    calendar.
+
+    future_meals() and meals_between() read the meals after a date or in a
+    range, with their concrete type and the number of sophomores signed up,
+    from a single aggregated query. calendar_availability() turns that into
+    the dates that can still be picked and the hover text for each date, and
+    meal_info() into the counts the signup page's meal_info API returns,
+    without further queries.
+'''
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
+from django.utils import timezone
+
+from kitchen.models import Meal
+
+
+class MealAvailability(object):
+    '''
+        One meal's sophomore count, without the meal itself.
+
+        meal_type is the concrete class (Brunch, Lunch or Dinner).
+    '''
+    def __init__(self, id, day, meal_type, num_sophomores, sophomore_limit):
+        self.id = id
+        self.day = day
+        self.meal_type = meal_type
+        self.num_sophomores = num_sophomores
+        self.sophomore_limit = sophomore_limit
+
+    def is_full(self):
+        return self.num_sophomores >= self.sophomore_limit
+
+    def sophomore_limit_text(self):
+        return "%s/%s" % (self.num_sophomores, self.sophomore_limit)
+
+def meal_availability(meal_q):
+    '''
+        A MealAvailability for every meal in meal_q, ordered by day, from
+        one aggregated query.
+    '''
+    meal_q = meal_q.order_by('day', 'id')\
+                   .annotate(num_sophomores=Count('prospectivemealentry'))\
+                   .values_list('id', 'day', 'real_type_id', 'num_sophomores', 'sophomore_limit')
+
+    # ContentTypes are cached by their manager
+    return [MealAvailability(meal_id, day, ContentType.objects.get_for_id(real_type_id).model_class(),
+                             num_sophomores, sophomore_limit)
+            for meal_id, day, real_type_id, num_sophomores, sophomore_limit in meal_q]
+
+def future_meals(after=None):
+    '''
+        The meals after the given date (default today).
+    '''
+    return meal_availability(Meal.objects.filter(day__gt=after or timezone.now()))
+
+def meals_between(start, end):
+    '''
+        The meals from start to end, both included.
+    '''
+    return meal_availability(Meal.objects.filter(day__range=(start, end)))
+
+def calendar_availability(meals):
+    '''
+        Returns (dates_allowed, hover_text) for the calendar picker: the
+        sorted "YYYY-MM-DD" dates that have a meal with space left, and
+        {"YYYY-MM-DD": "Lunch: 3/5,Dinner: 5/5"} for every date with a meal.
+    '''
+    dates_allowed = set()
+    hover_text = {}
+
+    for meal in meals:
+        d = meal.day.strftime("%Y-%m-%d")
+        text = "%s: %s" % (meal.meal_type.__name__, meal.sophomore_limit_text())
+        hover_text[d] = hover_text[d] + "," + text if d in hover_text else text
+
+        if not meal.is_full():
+            dates_allowed.add(d)
+
+    return sorted(dates_allowed), hover_text
+
+def meal_info(meals):
+    '''
+        {"YYYY-MM-DD": {"brunch": [sophomores, limit], "lunch": ..., "dinner": ...}}
+        for every date with a meal, with [-1, -1] for a meal that date does
+        not have.
+    '''
+    info = {}
+    for meal in meals:
+        day = info.setdefault(meal.day.strftime("%Y-%m-%d"), {'brunch': (-1, -1), 'lunch': (-1, -1), 'dinner': (-1, -1)})
+        day[meal.meal_type.__name__.lower()] = (meal.num_sophomores, meal.sophomore_limit)
+    return info
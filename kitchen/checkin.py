@@ -0,0 +1,153 @@
+'''
+    Check-in at the door for sophomore meals.
+
+    When a meal opens, its roster (netid -> signup) is read into memory with
+    one query, so checking a student in is a dictionary lookup. Check-ins
+    are marked completed in batches: one UPDATE ... WHERE id IN (...) once
+    CHECKIN_BATCH_SIZE of them are waiting or the oldest has waited
+    CHECKIN_FLUSH_SECONDS, and whatever is left when the meal is closed.
+    The kiosk page polls, so the deadline is checked even when nobody is
+    checking in.
+
+    Rosters are kept per process, so closing a meal only flushes the
+    roster of the process that gets the request. Every kiosk request, polls
+    included, writes back the check-ins that are due, so the others are
+    saved within CHECKIN_FLUSH_SECONDS; rosters of past days are flushed and
+    dropped the next time a roster is opened.
+    Check-ins younger than CHECKIN_FLUSH_SECONDS are lost if a process
+    stops.
+'''
+import threading, time
+
+from django.conf import settings
+from django.utils import timezone
+
+from recruitment.models import ProspectiveMealEntry
+
+BATCH_SIZE = getattr(settings, 'CHECKIN_BATCH_SIZE', 10)
+FLUSH_SECONDS = getattr(settings, 'CHECKIN_FLUSH_SECONDS', 30)
+
+# Results of MealRoster.check_in()
+CHECKED_IN = 'checked in'
+ALREADY_CHECKED_IN = 'already checked in'
+NOT_SIGNED_UP = 'not signed up'
+
+
+class MealRoster(object):
+    '''
+        The sophomores signed up for one meal, by netid.
+
+        entries - {netid: [entry id, name, checked in]}
+        pending - ids of the entries checked in but not yet written back
+    '''
+    def __init__(self, meal_id, day):
+        self.meal_id = meal_id
+        self.day = day
+        self.entries = {}
+        self.pending = []
+        self.oldest_pending = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        '''
+            Reads the roster from the database. Check-ins that are still
+            pending stay checked in.
+        '''
+        pending = set(self.pending)
+        entry_q = ProspectiveMealEntry.objects.filter(meal=self.meal_id)\
+                                              .values_list('id', 'prospective__netid', 'prospective__first_name',
+                                                           'prospective__last_name', 'completed')
+        self.entries = dict((netid.lower(), [entry_id, "%s %s" % (first_name, last_name), completed or entry_id in pending])
+                            for entry_id, netid, first_name, last_name, completed in entry_q)
+
+    def check_in(self, netid):
+        '''
+            Returns (status, name), where status is CHECKED_IN,
+            ALREADY_CHECKED_IN or NOT_SIGNED_UP. Someone who is not on the
+            roster is looked for once more in the database, in case they
+            signed up after the meal opened.
+        '''
+        netid = netid.strip().lower()
+        with self._lock:
+            entry = self.entries.get(netid)
+            if entry is None:
+                self.load()
+                entry = self.entries.get(netid)
+                if entry is None:
+                    return NOT_SIGNED_UP, netid
+
+            entry_id, name, checked_in = entry
+            if checked_in:
+                return ALREADY_CHECKED_IN, name
+
+            entry[2] = True
+            self.pending.append(entry_id)
+            if self.oldest_pending is None:
+                self.oldest_pending = time.time()
+
+            if len(self.pending) >= BATCH_SIZE or time.time() - self.oldest_pending >= FLUSH_SECONDS:
+                self._flush()
+            return CHECKED_IN, name
+
+    def flush(self):
+        '''
+            Writes the pending check-ins back. Returns how many there were.
+        '''
+        with self._lock:
+            return self._flush()
+
+    def flush_if_due(self):
+        '''
+            Writes the pending check-ins back if the oldest has waited
+            FLUSH_SECONDS. Returns how many were written.
+        '''
+        with self._lock:
+            if self.oldest_pending is not None and time.time() - self.oldest_pending >= FLUSH_SECONDS:
+                return self._flush()
+        return 0
+
+    def _flush(self):
+        num_pending = len(self.pending)
+        if self.pending:
+            ProspectiveMealEntry.objects.filter(id__in=self.pending).update(completed=True, modified=timezone.now())
+        self.pending = []
+        self.oldest_pending = None
+        return num_pending
+
+    def num_checked_in(self):
+        return sum(1 for entry_id, name, checked_in in self.entries.values() if checked_in)
+
+
+_rosters = {}
+_rosters_lock = threading.Lock()
+
+def open_roster(meal):
+    '''
+        The meal's roster, read from the database the first time. Its
+        overdue check-ins are written back, and the rosters of meals on
+        earlier days are flushed and dropped.
+    '''
+    today = timezone.localtime(timezone.now()).date()
+    with _rosters_lock:
+        past = [meal_id for meal_id, roster in _rosters.items() if roster.day < today and meal_id != meal.pk]
+        old_rosters = [_rosters.pop(meal_id) for meal_id in past]
+        if meal.pk not in _rosters:
+            _rosters[meal.pk] = MealRoster(meal.pk, meal.day)
+        roster = _rosters[meal.pk]
+
+    for old_roster in old_rosters:
+        old_roster.flush()
+    roster.flush_if_due()
+    return roster
+
+def close_roster(meal_id):
+    '''
+        Writes back the meal's pending check-ins and forgets its roster.
+        Returns how many check-ins were written.
+    '''
+    with _rosters_lock:
+        roster = _rosters.pop(meal_id, None)
+    if roster is None:
+        return 0
+    return roster.flush()
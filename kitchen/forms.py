@@ -1,7 +1,6 @@
-from collections import Counter
-
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
 from django.shortcuts import redirect
 
@@ -13,7 +12,8 @@ from crispy_forms.bootstrap import (
 
 from functools import partial
 
-from kitchen.models import Brunch, Lunch, Dinner
+from kitchen import schedule
+from kitchen.models import Meal, Brunch, Lunch, Dinner
 from charterclub.models import Prospective
 
 from recruitment.models import ProspectiveMealEntry
@@ -44,14 +44,35 @@ class MealSignupForm(forms.Form):
     helper.add_input(Submit('submit', 'submit', css_class='btn-primary'))
 
     def add_prospective(self, prospective):
-        if self.is_valid():
-            entry = ProspectiveMealEntry(meal=self.meal, prospective=self.prospective)
-            entry.save()
-
+        '''
+            Signs the prospective up for the meal. The meal and the
+            prospective are locked while the meal's sophomore count and the
+            prospective's monthly count are checked again, and the entry is
+            made in the same transaction, so a burst of signups cannot
+            overbook the meal or the monthly limit. Returns False, with the
+            reason added to the form's errors, if the meal filled up in the
+            meantime.
+        '''
+        if not self.is_valid():
+            return False
+
+        try:
+            with transaction.atomic():
+                meal = Meal.lock(self.meal.pk)
+                Prospective.objects.select_for_update().get(pk=self.prospective.pk)
+
+                check_meal_signup(self.prospective, meal)
+                ProspectiveMealEntry.objects.create(meal=meal, prospective=self.prospective)
+        except ValidationError as e:
+            self.add_error(None, e)
+            return False
+        return True
 
     def clean(self):
-        date = self.cleaned_data['date']
-        meal_type = self.cleaned_data['meal_type']
+        date = self.cleaned_data.get('date')
+        meal_type = self.cleaned_data.get('meal_type')
+        if not date or not meal_type:
+            return self.cleaned_data
 
         # Do the query
         if meal_type == 'Brunch':
@@ -63,41 +84,95 @@ class MealSignupForm(forms.Form):
         else:
             raise ValidationError('Not Appropriate MealType:%s' % meal_type)
 
+        m = m.first()
+
         # Check if there is a meal on that date
         if not m:
             raise ValidationError('There is not a meal of type:%s on date %s' % (meal_type, date))
 
-        limit = DynamicSettingsServices.get('default_sophomore_meal_per_month')
-        # Now check if the meal is full
-        if m[0].is_full():
-            raise ValidationError('Sorry! This meal has been filled up. Try refreshing the data.')
-        if will_exceed_meal_limit(self.prospective, m[0]):
-            raise ValidationError('You\'ve reached the limit of %s meals per month' % limit)
-        if already_signed_up_for_meal(self.prospective, m[0]):
-            raise ValidationError("Looks like you've already signed up for this meal %s" % m[0])
-        self.meal = m[0]
+        # An early check for the error messages; add_prospective() checks
+        # again under a lock
+        check_meal_signup(self.prospective, m)
+        self.meal = m
 
         return self.cleaned_data
 
+def check_meal_signup(prospective, meal):
+    '''
+        Raises ValidationError if the prospective cannot sign up for the
+        meal. The counts are only race-free inside add_prospective()'s
+        transaction, after the meal has been locked.
+    '''
+    if meal.is_full():
+        raise ValidationError('Sorry! This meal has been filled up. Try refreshing the data.')
+    if will_exceed_meal_limit(prospective, meal):
+        limit = DynamicSettingsServices.get('default_sophomore_meal_per_month')
+        raise ValidationError('You\'ve reached the limit of %s meals per month' % limit)
+    if already_signed_up_for_meal(prospective, meal):
+        raise ValidationError("Looks like you've already signed up for this meal %s" % meal)
+
     #CHECK if montly meal limit has been exceeded
 def will_exceed_meal_limit(prospective, next_meal):
-    this_months_entries = prospective.prospectivemealentry_set.filter(meal__day__month=timezone.now().date().month)
-    group =  ["%s-%s" % (entry.meal.day.month, entry.meal.day.year) for entry in this_months_entries]
-
-    group.append("%s-%s" % (next_meal.day.month, next_meal.day.year))
-
-    freq = Counter(group)
-    print freq
+    '''
+        Whether one more meal would take the prospective over the limit of
+        meals in next_meal's month, counted in the database.
+    '''
+    this_months_entries = prospective.prospectivemealentry_set.filter(meal__day__year=next_meal.day.year,
+                                                                      meal__day__month=next_meal.day.month)
 
     limit = DynamicSettingsServices.get('default_sophomore_meal_per_month')
-    if  any(f > limit for f in freq.itervalues()):
-            return True        
+    return this_months_entries.count() + 1 > limit
 
 def already_signed_up_for_meal(prospective, meal):
-    if prospective.prospectivemealentry_set.filter(meal=meal):
-        return True
-    return False
+    return prospective.prospectivemealentry_set.filter(meal=meal).exists()
         
+##################################################
+#   MealSchedule Form
+#   Lets officers create a semester of meals from the admin
+###################################################
+class MealScheduleForm(forms.Form):
+    '''
+        A CSV schedule or recurrence rules for kitchen/schedule.py.
+    '''
+    schedule_file = forms.FileField(required=False, label="CSV schedule",
+                                    help_text="Columns: date,type and optionally name,description,sophomore_limit,special_note")
+    rules = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}),
+                            help_text='Or rules such as "Dinner Mon-Thu, Lunch Mon-Fri, Brunch Sat-Sun"')
+    start = forms.DateField(required=False, help_text="First day for the rules")
+    end = forms.DateField(required=False, help_text="Last day for the rules")
+    sophomore_limit = forms.IntegerField(initial=0, min_value=0, help_text="For meals that do not give one")
+    description = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}),
+                                  help_text="For meals that do not give one")
+
+    def clean(self):
+        schedule_file = self.cleaned_data.get('schedule_file')
+        rules = self.cleaned_data.get('rules')
+        start = self.cleaned_data.get('start')
+        end = self.cleaned_data.get('end')
+        defaults = {'sophomore_limit': self.cleaned_data.get('sophomore_limit') or 0,
+                    'description': self.cleaned_data.get('description') or ''}
+
+        if bool(schedule_file) == bool(rules):
+            raise ValidationError('Upload a CSV schedule or write rules, but not both.')
+
+        try:
+            if schedule_file:
+                self.meals = schedule.read_csv(schedule_file, **defaults)
+            else:
+                if not start or not end or end < start:
+                    raise ValidationError('Rules need a start and an end date.')
+                self.meals = schedule.expand_rules(schedule.parse_rules(rules), start, end, **defaults)
+        except schedule.ScheduleError as e:
+            raise ValidationError(unicode(e))
+
+        return self.cleaned_data
+
+    def create_meals(self):
+        '''
+            Returns (number of meals created, number already there).
+        '''
+        return schedule.create_meals(self.meals)
+
 ##################################################
 #   MealSignup Form
 #   Allows sophomores to cancel a meal on a specific date
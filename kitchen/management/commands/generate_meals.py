@@ -0,0 +1,65 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from kitchen import schedule
+
+
+class Command(BaseCommand):
+    help = ('Creates the meals in a schedule: a CSV file (date,type[,name,description,sophomore_limit,special_note]) '
+            'or rules such as "Dinner Mon-Thu, Brunch Sat-Sun" with --start and --end. '
+            'Meals that already exist are skipped, so it is safe to run again.')
+    args = '[schedule.csv]'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--rules',
+            dest='rules',
+            help='Recurrence rules, for example "Dinner Mon-Thu, Lunch Mon-Fri, Brunch Sat-Sun"'),
+        make_option('--start',
+            dest='start',
+            help='First day (YYYY-MM-DD) the rules are applied to'),
+        make_option('--end',
+            dest='end',
+            help='Last day (YYYY-MM-DD) the rules are applied to'),
+        make_option('--sophomore-limit',
+            dest='sophomore_limit',
+            type='int',
+            default=0,
+            help='Sophomore limit of meals that do not give one'),
+        make_option('--description',
+            dest='description',
+            default='',
+            help='Description of meals that do not give one'),
+        make_option('--dry-run',
+            action='store_true',
+            dest='dry_run',
+            default=False,
+            help='Only report how many meals the schedule has'),
+    )
+
+    def handle(self, *args, **options):
+        defaults = {'sophomore_limit': options['sophomore_limit'],
+                    'description': options['description'].decode('utf-8')}
+
+        try:
+            if args:
+                with open(args[0], 'rb') as f:
+                    meals = schedule.read_csv(f, **defaults)
+            elif options.get('rules'):
+                start, end = parse_date(options.get('start') or ''), parse_date(options.get('end') or '')
+                if not start or not end or end < start:
+                    raise CommandError('Give --start and --end dates (YYYY-MM-DD) for the rules')
+                rules = schedule.parse_rules(options['rules'].decode('utf-8'))
+                meals = schedule.expand_rules(rules, start, end, **defaults)
+            else:
+                raise CommandError('Give a CSV file or --rules')
+        except (schedule.ScheduleError, IOError, ValueError) as e:
+            raise CommandError(e)
+
+        if options['dry_run']:
+            self.stdout.write('The schedule has %s meals.' % len(meals))
+            return
+
+        num_created, num_skipped = schedule.create_meals(meals)
+        self.stdout.write('Created %s meals, skipped %s that already existed.' % (num_created, num_skipped))
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0004_auto_20151201_2252'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='meal',
+            name='day',
+            field=models.DateField(db_index=True),
+            preserve_default=True,
+        ),
+    ]
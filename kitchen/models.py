@@ -1,7 +1,56 @@
+from collections import defaultdict
+from datetime import timedelta
+
 from django.db import models
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete
+
+# How long an assembled week of the menu stays cached (see Meal.get_week)
+WEEKLY_MENU_CACHE_TIMEOUT = getattr(settings, 'WEEKLY_MENU_CACHE_TIMEOUT', 60)
+
+def cast_all(objs):
+    '''
+        Downcasts InheritanceCastModel instances to their most derived class.
+        Rows are grouped by real_type and each concrete type is fetched with
+        one `pk IN (...)` query, so N rows cost at most one query per type
+        instead of one per row. Order is preserved.
+    '''
+    objs = list(objs)
+
+    pks_by_type = defaultdict(set)
+    for obj in objs:
+        if type(obj) is not obj.cast_class():
+            pks_by_type[obj.real_type_id].add(obj.pk)
+
+    casted = {}
+    for real_type_id, pks in pks_by_type.items():
+        model = ContentType.objects.get_for_id(real_type_id).model_class()
+        for obj in model._base_manager.filter(pk__in=pks):
+            casted[(real_type_id, obj.pk)] = obj
+
+    return [casted.get((obj.real_type_id, obj.pk), obj) for obj in objs]
+
+def connect_model_signals(handler, model):
+    '''
+        Connects handler to post_save and post_delete for model and every
+        model that inherits from it. Django sends these signals with the
+        concrete class as the sender, so each subclass needs its own
+        connection; subclasses have to be defined before this is called.
+    '''
+    post_save.connect(handler, sender=model)
+    post_delete.connect(handler, sender=model)
+    for subclass in model.__subclasses__():
+        if not subclass._meta.abstract and not getattr(subclass, '_deferred', False):
+            connect_model_signals(handler, subclass)
+
+class InheritanceCastQuerySet(models.QuerySet):
+    def cast_all(self):
+        return cast_all(self)
 
 # Taken from: http://stackoverflow.com/questions/929029/how-do-i-access-the-child-classes-of-an-object-in-django-without-knowing-the-name/929982#929982
 class InheritanceCastModel(models.Model):
@@ -14,6 +63,8 @@ class InheritanceCastModel(models.Model):
     """
     real_type = models.ForeignKey(ContentType, editable=False)
 
+    objects = InheritanceCastQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if not self.id:
             self.real_type = self._get_real_type()
@@ -22,8 +73,18 @@ class InheritanceCastModel(models.Model):
     def _get_real_type(self):
         return ContentType.objects.get_for_model(type(self))
 
+    def cast_class(self):
+        '''
+            The most derived model class of this instance. ContentTypes are
+            cached by their manager, so this does not hit the database.
+        '''
+        return ContentType.objects.get_for_id(self.real_type_id).model_class()
+
     def cast(self):
-        return self.real_type.get_object_for_this_type(pk=self.pk)
+        model = self.cast_class()
+        if type(self) is model:
+            return self
+        return model._base_manager.using(self._state.db).get(pk=self.pk)
 
     class Meta:
         abstract = True
@@ -46,7 +107,7 @@ def validate_file(fieldfile_obj):
 class Meal(InheritanceCastModel):
     display_name = "Meal"
     # Fields of this object
-    day             = models.DateField()
+    day             = models.DateField(db_index=True)
     sophomore_limit  = models.IntegerField(default=0, help_text="Put '0' to not allow sophomores") 
     name            = models.CharField(max_length=100, blank=True, help_text="Optional Name")
     description    = models.TextField(max_length=1000, help_text="What are we eating today?")
@@ -57,15 +118,76 @@ class Meal(InheritanceCastModel):
     class Meta:
         ordering = ['-day']
 
+    def __init__(self, *args, **kwargs):
+        super(Meal, self).__init__(*args, **kwargs)
+
+        # The week this meal was cached under, in case save() moves it
+        self._saved_day = self.day if self.pk else None
+
     def __unicode__(self):
-        return "%s %s" % (self.day.strftime("%m/%d/%y %a"), self.cast().__class__.__name__)
+        return "%s %s" % (self.day.strftime("%m/%d/%y %a"), self.cast_class().__name__)
+
+    @staticmethod
+    def week_cache_key(day):
+        '''
+            Cache key of the Monday to Sunday week that day falls in, by its
+            ISO year and week number.
+        '''
+        year, week, weekday = day.isocalendar()
+        return 'kitchen.weekly_menu.%d-W%02d' % (year, week)
+
+    @staticmethod
+    def get_week(day):
+        '''
+            The menu of the week that day falls in, as a list of
+            (day, brunch, lunch, dinner) from Monday to Sunday, with None
+            where there is no such meal. Each meal has num_sophomores set.
+
+            Built from one range query plus one query per meal type, and
+            cached until a meal in that week, or a sophomore's signup for
+            one, is saved or deleted. Without a shared cache that only
+            reaches the process that made the change; the others keep
+            their copy for up to WEEKLY_MENU_CACHE_TIMEOUT seconds.
+        '''
+        key = Meal.week_cache_key(day)
+        week = cache.get(key)
+        if week is not None:
+            return week
+
+        monday = day - timedelta(days=day.weekday())
+        days = [monday + timedelta(days=i) for i in range(7)]
+
+        meals = list(Meal.objects.filter(day__range=(days[0], days[-1])).order_by('id')
+                                 .annotate(num_sophomores=Count('prospectivemealentry')))
+        meals_by_day = defaultdict(dict)
+        for meal, casted in zip(meals, cast_all(meals)):
+            casted.num_sophomores = meal.num_sophomores
+            meals_by_day[casted.day].setdefault(type(casted), casted)
+
+        week = [(d, meals_by_day[d].get(Brunch), meals_by_day[d].get(Lunch), meals_by_day[d].get(Dinner)) 
+                for d in days]
+        cache.set(key, week, WEEKLY_MENU_CACHE_TIMEOUT)
+        return week
+
+    @staticmethod
+    def invalidate_week(day):
+        cache.delete(Meal.week_cache_key(day))
 
 
     def num_of_sophomores(self):
         '''
             Number of sophomores eating here
         '''
-        return len(self.prospectivemealentry_set.all())
+        return self.prospectivemealentry_set.count()
+
+    @staticmethod
+    def lock(meal_id):
+        '''
+            Locks the meal with select_for_update until the end of the
+            current transaction, so that sophomores signing up for it are
+            counted one at a time. Must be called inside transaction.atomic().
+        '''
+        return Meal.objects.select_for_update().get(pk=meal_id)
 
     def is_full(self):
         '''
@@ -100,4 +222,16 @@ class Dinner(Meal):
 
 Dinner._meta.get_field('day').unqiue = True
 
-    
\ No newline at end of file
+    
+
+
+def invalidate_weekly_menu(sender, instance, **kwargs):
+    '''
+        Drops the cached weeks a meal was and is in when it changes.
+    '''
+    if instance._saved_day:
+        Meal.invalidate_week(instance._saved_day)
+    Meal.invalidate_week(instance.day)
+    instance._saved_day = instance.day
+
+connect_model_signals(invalidate_weekly_menu, Meal)
@@ -0,0 +1,204 @@
+'''
+    Creates a semester's worth of meals at once.
+
+    A schedule is either a CSV file with a row per meal:
+
+        date,type,name,description,sophomore_limit,special_note
+        2016-09-12,Dinner,,Roast chicken,4,
+
+    (only date and type are required), or recurrence rules such as
+    "Dinner Mon-Thu, Brunch Sat-Sun, Lunch Mon, Wed" expanded over a range
+    of dates.
+
+    create_meals() inserts the Meal rows with one bulk INSERT, reads their
+    ids back, and inserts the Brunch/Lunch/Dinner rows with one executemany
+    per type, all in one transaction. A meal of the same type already on
+    that day is left alone, so running the same schedule again only adds
+    what is missing.
+'''
+import csv
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date
+
+from kitchen.models import Meal, Brunch, Lunch, Dinner
+
+MEAL_TYPES = dict((model.__name__.lower(), model) for model in (Brunch, Lunch, Dinner))
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+class ScheduleError(Exception):
+    '''
+        A schedule that cannot be read. The message says which line.
+    '''
+    pass
+
+def meal_type(name):
+    model = MEAL_TYPES.get(name.strip().lower())
+    if model is None:
+        raise ScheduleError('"%s" is not a meal type. Use Brunch, Lunch or Dinner.' % name)
+    return model
+
+def weekday(name):
+    name = name.strip().lower()[:3]
+    if name not in WEEKDAYS:
+        raise ScheduleError('"%s" is not a day of the week.' % name)
+    return WEEKDAYS.index(name)
+
+def parse_days(text):
+    '''
+        "Mon-Thu" -> set([0, 1, 2, 3]). Ranges may wrap around, as in
+        "Fri-Mon", and "daily" means every day.
+    '''
+    text = text.strip()
+    if text.lower() == 'daily':
+        return set(range(7))
+
+    # A hyphen or an en dash
+    bounds = re.split(u'\\s*[-\u2013]\\s*', text)
+    if len(bounds) == 1:
+        return set([weekday(bounds[0])])
+    if len(bounds) != 2:
+        raise ScheduleError('"%s" is not a day or a range of days.' % text)
+
+    first, last = weekday(bounds[0]), weekday(bounds[1])
+    return set((first + i) % 7 for i in range((last - first) % 7 + 1))
+
+def parse_rules(text):
+    '''
+        "Dinner Mon-Thu, Brunch Sat-Sun" -> {Dinner: set([0, 1, 2, 3]),
+        Brunch: set([5, 6])}. Rules are separated by commas, semicolons or
+        new lines; a part without a meal type adds days to the rule before.
+    '''
+    rules = defaultdict(set)
+    model = None
+    for part in re.split(r'[,;\n]', text):
+        part = part.strip()
+        if not part:
+            continue
+
+        words = part.split(None, 1)
+        if words[0].lower() in MEAL_TYPES:
+            model = meal_type(words[0])
+            if len(words) == 1:
+                raise ScheduleError('"%s" needs the days it is served, as in "%s Mon-Fri".' % (part, words[0]))
+            part = words[1]
+        elif model is None:
+            raise ScheduleError('"%s" should start with a meal type, as in "Dinner Mon-Thu".' % part)
+
+        rules[model] |= parse_days(part)
+    return dict(rules)
+
+def expand_rules(rules, start, end, **fields):
+    '''
+        One meal (a dict for create_meals()) for every day from start to end
+        that a rule serves. Any other fields, such as sophomore_limit or
+        description, are given to every meal.
+    '''
+    meals = []
+    day = start
+    while day <= end:
+        for model, weekdays in sorted(rules.items(), key=lambda rule: rule[0].__name__):
+            if day.weekday() in weekdays:
+                meal = dict(fields, day=day, model=model)
+                meals.append(meal)
+        day += timedelta(days=1)
+    return meals
+
+def read_csv(f, **defaults):
+    '''
+        The meals in a CSV schedule. Columns other than date and type are
+        optional; defaults fill in the ones a file leaves out or blank. The
+        file must be UTF-8, with or without the byte order mark Excel adds.
+    '''
+    meals = []
+    reader = csv.DictReader(f)
+    for line, row in enumerate(reader, 2):
+        try:
+            row = dict((key.decode('utf-8').lstrip(u'\ufeff').strip().lower(), (value or '').strip().decode('utf-8'))
+                       for key, value in row.items() if key)
+        except UnicodeDecodeError:
+            raise ScheduleError('Line %s is not UTF-8 text. Save the file as "CSV UTF-8".' % line)
+
+        try:
+            day = parse_date(row.get('date', ''))
+        except ValueError:
+            day = None
+        if not day:
+            raise ScheduleError('Line %s: "%s" is not a date like 2016-09-12.' % (line, row.get('date', '')))
+
+        try:
+            meal = dict(defaults, day=day, model=meal_type(row.get('type', '')))
+        except ScheduleError as e:
+            raise ScheduleError('Line %s: %s' % (line, e))
+
+        for field in ('name', 'description', 'special_note'):
+            if row.get(field):
+                meal[field] = row[field]
+        if row.get('sophomore_limit'):
+            if not row['sophomore_limit'].isdigit():
+                raise ScheduleError('Line %s: "%s" is not a sophomore limit.' % (line, row['sophomore_limit']))
+            meal['sophomore_limit'] = int(row['sophomore_limit'])
+        meals.append(meal)
+    return meals
+
+def create_meals(meals):
+    '''
+        Creates the meals (dicts of day, model and any other Meal fields)
+        that do not exist yet, and returns (number created, number skipped
+        because a meal of that type was already on that day).
+    '''
+    if not meals:
+        return 0, 0
+
+    real_types = dict((model, ContentType.objects.get_for_model(model).id) for model in MEAL_TYPES.values())
+    days = [meal['day'] for meal in meals]
+
+    with transaction.atomic():
+        existing_ids = set()
+        taken = set()
+        for meal_id, day, real_type_id in Meal.objects.filter(day__range=(min(days), max(days))).order_by()\
+                                                      .values_list('id', 'day', 'real_type_id'):
+            existing_ids.add(meal_id)
+            taken.add((day, real_type_id))
+
+        new_meals = []
+        for meal in meals:
+            fields = dict(meal)
+            model = fields.pop('model')
+            key = (fields['day'], real_types[model])
+            if key in taken:
+                continue
+            taken.add(key)
+            new_meals.append(Meal(real_type_id=real_types[model], **fields))
+
+        if not new_meals:
+            return 0, len(meals)
+
+        # bulk_create() skips InheritanceCastModel.save() and cannot make
+        # the child rows of an inherited model, so do those by hand
+        Meal.objects.bulk_create(new_meals)
+
+        new_keys = set((meal.day, meal.real_type_id) for meal in new_meals)
+        new_ids = defaultdict(list)
+        for meal_id, day, real_type_id in Meal.objects.filter(day__range=(min(days), max(days))).order_by()\
+                                                      .values_list('id', 'day', 'real_type_id'):
+            if meal_id not in existing_ids and (day, real_type_id) in new_keys:
+                new_ids[real_type_id].append(meal_id)
+
+        cursor = connection.cursor()
+        for model, real_type_id in real_types.items():
+            if new_ids[real_type_id]:
+                cursor.executemany('INSERT INTO %s (%s) VALUES (%%s)' % (connection.ops.quote_name(model._meta.db_table),
+                                                                        connection.ops.quote_name(model._meta.pk.column)),
+                                   [(meal_id,) for meal_id in new_ids[real_type_id]])
+
+    # No post_save signals were sent, so drop the cached weekly menus here
+    for day in set(meal.day - timedelta(days=meal.day.weekday()) for meal in new_meals):
+        Meal.invalidate_week(day)
+
+    return len(new_meals), len(meals) - len(new_meals)
@@ -1,3 +1,16 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from charterclub.testing import QueryPlanTestCase
+from kitchen.models import Meal
+
+class MealQueryPlanTest(QueryPlanTestCase):
+    '''
+        The menu pages look meals up by day, which should use the index.
+    '''
+
+    def test_meals_in_week(self):
+        start = date.today()
+        self.assertUsesIndex(Meal.objects.filter(day__gte=start, day__lt=start + timedelta(days=7)))
+
+    def test_meals_on_day(self):
+        self.assertUsesIndex(Meal.objects.filter(day=date.today()))
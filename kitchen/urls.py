@@ -30,10 +30,22 @@ urlpatterns = patterns('',
         r'^meal_info/([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})$',
         'kitchen.views.meal_info',
         name='meal_info'),
+    url(
+        r'^meal_info/$',
+        'kitchen.views.meal_info_range',
+        name='meal_info_range'),
     url(
         r'^meal_cancellation/(\d+)/(\d+)/(\w+)/(.+)',
         'kitchen.views.meal_cancellation',
         name='meal_cancellation'),
+    url(
+        r'^meal_checkin$',
+        'kitchen.views.meal_checkin',
+        name='meal_checkin_list'),
+    url(
+        r'^meal_checkin/(\d+)$',
+        'kitchen.views.meal_checkin',
+        name='meal_checkin'),
 )
 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
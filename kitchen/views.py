@@ -6,6 +6,7 @@ from charterclub.models import Prospective
 
 from kitchen.models import Meal, Brunch, Lunch, Dinner
 from kitchen.forms import MealSignupForm, MealCancellationForm
+from kitchen import availability, checkin
 
 from recruitment.models import ProspectiveMealEntry
 
@@ -13,6 +14,7 @@ from django.utils import timezone
 from django.utils.dateparse import parse_date
 
 import datetime
+from collections import defaultdict
 from django.core.urlresolvers  import reverse
 from django.http import HttpRequest
 
@@ -31,25 +33,8 @@ def weekly_menu_base(request, date, is_print_page=False):
     prev_week = target + datetime.timedelta(weeks=-1)
     next_week = target + datetime.timedelta(weeks=1)
 
-    monday = (target + datetime.timedelta(days=-target.weekday(), weeks=0))
-    week = [monday + datetime.timedelta(days=i) for i in range(0,7)]
-
     meals_iter = []
-
-    # Find the proper meals
-    for day in week:
-        brunch = Brunch.objects.filter(day=day)
-        lunch = Lunch.objects.filter(day=day)
-        dinner = Dinner.objects.filter(day=day)
-
-        # Dereference the hits
-        if lunch:
-            lunch = lunch[0]
-        if dinner:
-            dinner = dinner[0]
-        if brunch:
-            brunch = brunch[0]
-
+    for day, brunch, lunch, dinner in Meal.get_week(target):
         name = day.strftime("%a %m/%d")
 
         # Prevent both brunch and lunch from showing up, which screws up formatting
@@ -87,8 +72,7 @@ def weekly_menu_day_print(request, date):
 # Uses a calender widget to sign up for meals
 @permissions.prospective
 def meal_signup(request):
-    netid = permissions.get_username(request)
-    prospective = Prospective.objects.filter(netid=netid)[0]
+    prospective = permissions.get_identity(request).prospective
 
     # Give them a form to fill out
     if request.method == 'POST':
@@ -98,33 +82,12 @@ def meal_signup(request):
     else:
         form = MealSignupForm(prospective=prospective)
 
-    # Look at the meals in the future
-    future_meals =  Meal.objects.filter(day__gt=timezone.now())
-    future_dates = sorted(set([m.day for m in future_meals]))
-
-    # Figure out which ones are available
-    available_dates = []
-    calendar_date_to_text = {}
-
-    for d in future_dates:
-        m_a =  [m.cast() for m in Meal.objects.filter(day=d)]
-
-        hover_text = []
-
-        for m in m_a:
-            hover_text.append("%s: %s" % ( m.__class__.__name__, m.sophomore_limit_text()))
-
-            if m.num_of_sophomores() < m.sophomore_limit:
-                available_dates.append(d)
-
-        calendar_date_to_text[d.strftime("%Y-%m-%d")] = ",".join(hover_text)
-
-    # Which days can the choose on the calender picker?
-    dates_allowed = sorted(set([d.strftime("%Y-%m-%d") for d in available_dates]))
+    # Which days can they choose on the calender picker?
+    dates_allowed, calendar_date_to_text = availability.calendar_availability(availability.future_meals())
 
     #Get the meals that they ate this month
     now = timezone.now()
-    prospective_this_month_meals = prospective.prospectivemealentry_set.filter(meal__day__gte=now)
+    prospective_this_month_meals = prospective.prospectivemealentry_set.filter(meal__day__gte=now).select_related('meal')
 
 
     now = timezone.now()
@@ -139,8 +102,11 @@ def meal_signup(request):
         })
 
 from django.core.exceptions import FieldError
-from django.http import HttpResponse
+from django.db.models import Max
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.views.decorators.http import condition
 from datetime import date
+import hashlib
 import json
 
 def meal_info(request, month, day, year):
@@ -153,23 +119,59 @@ def meal_info(request, month, day, year):
     except:
         raise FieldError('Invalid Fields for /year/month/date in GET URL')
 
-    brunch = Brunch.objects.filter(day=d)
-    lunch = Lunch.objects.filter(day=d)
-    dinner = Dinner.objects.filter(day=d)
+    data = availability.meal_info(availability.meals_between(d, d))
+    data = data.get(d.strftime("%Y-%m-%d"), {'brunch': (-1, -1), 'lunch': (-1, -1), 'dinner': (-1, -1)})
+    return HttpResponse(json.dumps(data), content_type="application/json")
 
-    data = {}
-    string_s = ['brunch', 'lunch', 'dinner']
-    meals_qa = [brunch, lunch, dinner]
+# Longest range that /kitchen/meal_info/?from=&to= answers, in days
+MEAL_INFO_MAX_DAYS = 366
 
-    for string, meal_q in zip(string_s, meals_qa):
-        if not meal_q:
-            data[string] = (-1, -1)
+def meal_info_range_body(request):
+    '''
+        Parses ?from=YYYY-MM-DD&to=YYYY-MM-DD and returns (start, end, JSON
+        body) for meal_info_range, or None if the range is invalid. Worked
+        out once per request, since the ETag is a hash of the body.
+    '''
+    if not hasattr(request, '_meal_info_range'):
+        try:
+            start = parse_date(request.GET.get('from', ''))
+            end = parse_date(request.GET.get('to', ''))
+        except ValueError:
+            start = end = None
+
+        if not start or not end or end < start or (end - start).days > MEAL_INFO_MAX_DAYS:
+            request._meal_info_range = None
         else:
-            num_attending = len(meal_q[0].prospectivemealentry_set.all())
-            num_limit = meal_q[0].sophomore_limit
+            body = json.dumps(availability.meal_info(availability.meals_between(start, end)), sort_keys=True)
+            request._meal_info_range = (start, end, body)
+    return request._meal_info_range
+
+def meal_info_range_etag(request):
+    parsed = meal_info_range_body(request)
+    if parsed:
+        return hashlib.md5(parsed[2]).hexdigest()
+
+def meal_info_range_last_modified(request):
+    parsed = meal_info_range_body(request)
+    if parsed:
+        start, end, body = parsed
+        return ProspectiveMealEntry.objects.filter(meal__day__range=(start, end)).aggregate(Max('modified'))['modified__max']
+
+@condition(etag_func=meal_info_range_etag, last_modified_func=meal_info_range_last_modified)
+def meal_info_range(request):
+    '''
+        The sophomore counts and limits of every meal from ?from= to ?to=,
+        as {"YYYY-MM-DD": {"brunch": [sophomores, limit], ...}}. The ETag
+        and Last-Modified headers let the signup page revalidate with a 304
+        instead of downloading the counts again.
+    '''
+    parsed = meal_info_range_body(request)
+    if not parsed:
+        return HttpResponseBadRequest('Give ?from=YYYY-MM-DD&to=YYYY-MM-DD, at most %s days apart' % MEAL_INFO_MAX_DAYS)
 
-            data[string] = (num_attending, num_limit)
-    return HttpResponse(json.dumps(data), content_type="application/json")
+    response = HttpResponse(parsed[2], content_type="application/json")
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 @permissions.prospective
 def meal_cancellation(request, entry_id, student_id, meal_type, entry_date):
@@ -208,3 +210,62 @@ def meal_cancellation(request, entry_id, student_id, meal_type, entry_date):
             'meal_entry' : meal_entry,
             'form' : form,
     })
+
+@permissions.officer
+def meal_checkin(request, meal_id=None):
+    '''
+        The check-in kiosk for the door. Without a meal it lists today's
+        meals. POST a netid to check a sophomore in; "flush" writes the
+        check-ins so far back to the database and "close" also closes the
+        meal's roster (see kitchen/checkin.py).
+    '''
+    if meal_id is None:
+        return render(request, 'kitchen/meal_checkin.html', {
+            'meals': Meal.objects.filter(day=timezone.now().date()).order_by('id').cast_all(),
+        })
+
+    meal = Meal.objects.filter(pk=meal_id).first()
+    if not meal:
+        return render(request, 'standard_message.html', {
+            'subject': 'Oops. Looks like this meal doesn\'t exist',
+            'body' : 'Could not find meal_id=%s.' % meal_id,
+        })
+    meal = meal.cast()
+
+    status = name = None
+    if request.method == 'POST':
+        action = request.POST.get('action', 'check_in')
+        if action == 'close':
+            num_written = checkin.close_roster(meal.pk)
+            return render(request, 'standard_message.html', {
+                'subject': 'Closed check-in for %s' % meal,
+                'body' : 'Saved the last %s check-ins. Any taken through another server process are saved '
+                         'within %s seconds.' % (num_written, checkin.FLUSH_SECONDS),
+            })
+
+        roster = checkin.open_roster(meal)
+        if action == 'flush':
+            roster.flush()
+        elif request.POST.get('netid', '').strip():
+            status, name = roster.check_in(request.POST['netid'])
+    else:
+        roster = checkin.open_roster(meal)
+
+    if request.is_ajax():
+        return HttpResponse(json.dumps({'status': status,
+                                        'name': name,
+                                        'checked_in': roster.num_checked_in(),
+                                        'signed_up': len(roster.entries),
+                                        'pending': len(roster.pending)}),
+                            content_type="application/json")
+
+    return render(request, 'kitchen/meal_checkin.html', {
+        'meal': meal,
+        'status': status,
+        'name': name,
+        'checked_in': roster.num_checked_in(),
+        'signed_up': len(roster.entries),
+        'pending': len(roster.pending),
+        'flush_seconds': checkin.FLUSH_SECONDS,
+    })
+
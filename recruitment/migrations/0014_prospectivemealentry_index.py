@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0013_auto_20171004_2104'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='prospectivemealentry',
+            index_together=set([('prospective', 'meal')]),
+        ),
+    ]
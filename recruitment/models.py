@@ -1,8 +1,10 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 from django.utils import timezone
 
 from events.models import Entry
 from charterclub.models import limit_meals_attended_choices
+from kitchen.models import Meal
 
 import urllib
 
@@ -16,12 +18,18 @@ class ProspectiveMealEntry(models.Model):
     signup_date = models.DateField(blank=True, default=timezone.now().date())
     points = models.DecimalField("Number of points this meal is worth", default=1, max_digits=5, decimal_places=2)
 
+    # Last change to the signup, for the meal_info API's Last-Modified
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        index_together = (("prospective", "meal"),)
+
     def __unicode__(self):
         return "%s for %s" % (self.prospective, self.meal)
 
     def cancellation_url(self):
         base_url='kitchen/meal_cancellation/'
-        url = base_url + "%s/%s/%s/%s" % (self.id,self.prospective.id, self.meal.cast().__class__.__name__, self.signup_date.isoformat())
+        url = base_url + "%s/%s/%s/%s" % (self.id,self.prospective.id, self.meal.cast_class().__name__, self.signup_date.isoformat())
         return urllib.quote(url)
 
     def can_be_cancelled_by_user(self):
@@ -33,4 +41,17 @@ class ProspectiveEventEntry(Entry):
     '''
     completed = models.BooleanField("Has this person attended this event?", default=False)
     signup_date = models.DateField(blank=True, default=timezone.now().date())
-    points = models.DecimalField("Number of points this event is worth", default=1, max_digits=5, decimal_places=2)
\ No newline at end of file
+    points = models.DecimalField("Number of points this event is worth", default=1, max_digits=5, decimal_places=2)
+
+
+def invalidate_weekly_menu(sender, instance, **kwargs):
+    '''
+        The cached weekly menu shows how many sophomores signed up for each
+        meal, so drop the meal's week when a signup changes.
+    '''
+    day = Meal.objects.filter(pk=instance.meal_id).values_list('day', flat=True).first()
+    if day:
+        Meal.invalidate_week(day)
+
+post_save.connect(invalidate_weekly_menu, sender=ProspectiveMealEntry)
+post_delete.connect(invalidate_weekly_menu, sender=ProspectiveMealEntry)
@@ -1,3 +1,13 @@
-from django.test import TestCase
+from charterclub.testing import QueryPlanTestCase
+from recruitment.models import ProspectiveMealEntry
 
-# Create your tests here.
+class ProspectiveMealEntryQueryPlanTest(QueryPlanTestCase):
+    '''
+        Meal signups are checked per (prospective, meal) pair.
+    '''
+
+    def test_prospective_meal_pair(self):
+        self.assertUsesIndex(ProspectiveMealEntry.objects.filter(prospective=1, meal=1))
+
+    def test_prospective_meals(self):
+        self.assertUsesIndex(ProspectiveMealEntry.objects.filter(prospective=1))
@@ -57,7 +57,7 @@ def mailing_list_view(request):
 
 #@permissions.officer
 def meal_list_base(request, date, is_mailing_list=False):
-    officer = permissions.get_student(request).cast()
+    officer = permissions.get_student(request)
     target = parse_date(date)
 
     if not target: